@@ -0,0 +1,3 @@
+"""
+Reproducible benchmarks of API on synthetic catalogue of cards.
+"""
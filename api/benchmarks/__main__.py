@@ -0,0 +1,472 @@
+"""
+Command line interface of benchmarks, run from directory 'api':
+
+    python -m benchmarks run --cards 5000 --output before.json
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks startup --workers 2
+    python -m benchmarks concurrency --levels 1,4,8 --query-delay-ms 2
+    python -m benchmarks serialize --cards 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .runner import FLOWS, MIXED_FLOWS, summarize
+
+ALL_FLOWS = list(FLOWS) + list(MIXED_FLOWS)
+
+DEFAULT_DATABASE = os.path.join(tempfile.gettempdir(), "cardmaker-benchmark.db")
+# Compared statistics, True if greater value is better.
+COMPARED = {
+    "throughput_rps": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "sql_statements_per_request": False,
+}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def set_environment(args: argparse.Namespace):
+    """
+    Set database and other environment of application,
+    it must be set before application is imported.
+    Default SQLite database is recreated.
+
+    Args:
+        args (argparse.Namespace): parsed arguments with 'database_url'
+                and 'reset'
+    """
+    url = args.database_url
+    if url is None:
+        if os.path.exists(DEFAULT_DATABASE):
+            os.remove(DEFAULT_DATABASE)
+        url = f"sqlite:///{DEFAULT_DATABASE}"
+    elif not url.startswith("sqlite") and not args.reset:
+        sys.exit(f"All tables of {url} would be dropped, confirm by --reset.")
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SECRET_KEY", secrets.token_hex(32))
+    os.environ.setdefault("LOG_LEVEL", "warning")
+
+
+def run(args: argparse.Namespace) -> dict:
+    """
+    Seed database and run benchmark flows.
+    Environment of application must be set before it is imported.
+
+    Args:
+        args (argparse.Namespace): parsed arguments of command 'run'
+
+    Returns:
+        dict: description of environment, catalogue and results of flows
+    """
+    set_environment(args)
+
+    from cardmaker.database import get_engine
+    from main import app
+
+    from .catalogue import seed_catalogue
+    from .runner import run_benchmark
+
+    engine = get_engine()
+    start = time.perf_counter()
+    catalogue = seed_catalogue(
+        engine,
+        users=args.users,
+        cards=args.cards,
+        tags=args.tags,
+        tags_per_card=args.tags_per_card,
+        tag_skew=args.tag_skew,
+        seed=args.seed,
+    )
+    seed_duration = time.perf_counter() - start
+    results = asyncio.run(
+        run_benchmark(
+            app,
+            engine,
+            catalogue,
+            flows=args.flows,
+            requests=args.requests,
+            login_requests=args.login_requests,
+            storm_logins=args.storm_logins,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            seed=args.seed,
+        )
+    )
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": engine.url.get_backend_name(),
+        "parameters": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("command", "database_url", "output", "reset")
+        },
+        "catalogue": catalogue,
+        "seed_duration_s": round(seed_duration, 3),
+        "flows": results,
+    }
+
+
+def concurrency(args: argparse.Namespace) -> dict:
+    """
+    Seed database and compare throughput of one flow with database
+    sessions in thread pool and blocking event loop.
+
+    Args:
+        args (argparse.Namespace): parsed arguments of command 'concurrency'
+
+    Returns:
+        dict: description of environment and results by mode and level
+    """
+    set_environment(args)
+
+    from cardmaker.database import get_engine
+    from main import app
+
+    from .catalogue import seed_catalogue
+    from .runner import run_concurrency
+
+    engine = get_engine()
+    catalogue = seed_catalogue(
+        engine,
+        users=args.users,
+        cards=args.cards,
+        tags=args.tags,
+        seed=args.seed,
+    )
+    results = asyncio.run(
+        run_concurrency(
+            app,
+            engine,
+            catalogue,
+            flow=args.flow,
+            levels=args.levels,
+            requests=args.requests,
+            warmup=args.warmup,
+            seed=args.seed,
+            query_delay=args.query_delay_ms / 1000,
+        )
+    )
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": engine.url.get_backend_name(),
+        "parameters": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("command", "database_url", "output", "reset")
+        },
+        "database_threads": int(os.getenv("DATABASE_THREADS", "10")),
+        "modes": results,
+    }
+
+
+def startup(args: argparse.Namespace) -> dict:
+    """
+    Measure cold start: time from starting 'python main.py'
+    to the first successful response of 'GET /tags'.
+    Database is initialized before measurement.
+
+    Args:
+        args (argparse.Namespace): parsed arguments of command 'startup'
+
+    Returns:
+        dict: description of environment and statistics of cold starts
+    """
+    import httpx
+
+    env = dict(
+        os.environ,
+        API_PORT=str(args.port),
+        API_WORKERS=str(args.workers),
+        DATABASE_INIT="true" if args.database_init else "false",
+    )
+    env.setdefault("DATABASE_URL", f"sqlite:///{DEFAULT_DATABASE}")
+    env.setdefault("SECRET_KEY", secrets.token_hex(32))
+    env.setdefault("LOG_LEVEL", "warning")
+    subprocess.run([sys.executable, "create_db.py"], env=env, check=True)
+
+    durations = []
+    with httpx.Client(base_url=f"http://127.0.0.1:{args.port}") as client:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "main.py"], env=env, stdout=subprocess.DEVNULL
+            )
+            try:
+                while True:
+                    try:
+                        if client.get("/tags").status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    if process.poll() is not None:
+                        sys.exit("API process exited before serving request.")
+                    if time.perf_counter() - start > args.timeout:
+                        sys.exit("API did not serve request before timeout.")
+                    time.sleep(0.01)
+                durations.append(time.perf_counter() - start)
+            finally:
+                process.terminate()
+                process.wait()
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parameters": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("command", "output")
+        },
+        "startup_ms": summarize(durations),
+    }
+
+
+def serialize(args: argparse.Namespace) -> dict:
+    """
+    Measure serialization of cards built in memory into JSON body.
+
+    Args:
+        args (argparse.Namespace): parsed arguments of command 'serialize'
+
+    Returns:
+        dict: description of environment and results of serializers
+    """
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{DEFAULT_DATABASE}")
+    os.environ.setdefault("SECRET_KEY", secrets.token_hex(32))
+    os.environ.setdefault("LOG_LEVEL", "warning")
+
+    from .serialization import build_cards, run_serialization
+
+    cards = build_cards(
+        args.cards, tags_per_card=args.tags_per_card, seed=args.seed
+    )
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parameters": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("command", "output")
+        },
+        "serializers": run_serialization(cards, repeat=args.repeat),
+    }
+
+
+def _value(result: dict, key: str) -> float | None:
+    for part in key.split("."):
+        result = result.get(part, {})
+    return result if isinstance(result, (int, float)) else None
+
+
+def compare(args: argparse.Namespace):
+    """
+    Print relative change of main statistics of flows
+    between two results of command 'run'.
+
+    Args:
+        args (argparse.Namespace): parsed arguments of command 'compare'
+    """
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    for flow, result in after["flows"].items():
+        previous = before["flows"].get(flow)
+        if previous is None:
+            continue
+        print(flow)
+        for key, higher_is_better in COMPARED.items():
+            old, new = _value(previous, key), _value(result, key)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            better = (change > 0) == higher_is_better and change != 0
+            print(
+                f"  {key:<28} {old:>10.2f} {new:>10.2f} {change:>+8.1f} %"
+                f"{'  better' if better else ''}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser(
+        "run", help="seed database and measure API flows"
+    )
+    run_parser.add_argument(
+        "--database-url",
+        help="database to seed, e.g. MySQL started by "
+        "'docker-compose -f docker-compose-dev.yml up -d db' "
+        f"(default: SQLite {DEFAULT_DATABASE})",
+    )
+    run_parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="confirm dropping all tables of --database-url",
+    )
+    run_parser.add_argument("--users", type=int, default=20)
+    run_parser.add_argument("--cards", type=int, default=2000)
+    run_parser.add_argument("--tags", type=int, default=50)
+    run_parser.add_argument(
+        "--tags-per-card",
+        type=float,
+        default=3.0,
+        help="mean number of tags of card (Poisson distribution)",
+    )
+    run_parser.add_argument(
+        "--tag-skew",
+        type=float,
+        default=1.0,
+        help="exponent of Zipf distribution of tag popularity",
+    )
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument(
+        "--flows",
+        type=lambda value: value.split(","),
+        default=ALL_FLOWS,
+        help=f"flows in order of running (default: {','.join(ALL_FLOWS)})",
+    )
+    run_parser.add_argument(
+        "--requests", type=int, default=200, help="requests of each flow"
+    )
+    run_parser.add_argument("--login-requests", type=int, default=20)
+    run_parser.add_argument(
+        "--storm-logins",
+        type=int,
+        default=18,
+        help="concurrent logins of flow 'login_storm' "
+        "(default: PASSWORD_HASH_THREADS + PASSWORD_HASH_QUEUE)",
+    )
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument(
+        "--warmup", type=int, default=20, help="unmeasured reading requests"
+    )
+    run_parser.add_argument("--output", help="JSON file (default: stdout)")
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare two results of 'run'"
+    )
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    startup_parser = commands.add_parser(
+        "startup", help="measure time to first served request"
+    )
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--workers", type=int, default=1)
+    startup_parser.add_argument("--port", type=int, default=8013)
+    startup_parser.add_argument(
+        "--skip-database-init",
+        dest="database_init",
+        action="store_false",
+        help="start API with DATABASE_INIT=false",
+    )
+    startup_parser.add_argument(
+        "--timeout", type=float, default=60, help="seconds per start"
+    )
+    startup_parser.add_argument("--output", help="JSON file (default: stdout)")
+
+    concurrency_parser = commands.add_parser(
+        "concurrency",
+        help="compare database sessions in thread pool and on event loop",
+    )
+    concurrency_parser.add_argument(
+        "--database-url", help="database to seed, same as in 'run'"
+    )
+    concurrency_parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="confirm dropping all tables of --database-url",
+    )
+    concurrency_parser.add_argument("--users", type=int, default=20)
+    concurrency_parser.add_argument("--cards", type=int, default=2000)
+    concurrency_parser.add_argument("--tags", type=int, default=50)
+    concurrency_parser.add_argument("--seed", type=int, default=0)
+    concurrency_parser.add_argument(
+        "--flow", choices=list(FLOWS), default="get"
+    )
+    concurrency_parser.add_argument(
+        "--levels",
+        type=lambda value: [int(level) for level in value.split(",")],
+        default=[1, 4, 8],
+        help="concurrent requests, at most size of connection pool "
+        "(default: 1,4,8)",
+    )
+    concurrency_parser.add_argument(
+        "--requests", type=int, default=200, help="requests of each level"
+    )
+    concurrency_parser.add_argument("--warmup", type=int, default=20)
+    concurrency_parser.add_argument(
+        "--query-delay-ms",
+        type=float,
+        default=0.0,
+        help="delay added to each SQL statement, simulates network "
+        "round trip to database server",
+    )
+    concurrency_parser.add_argument(
+        "--output", help="JSON file (default: stdout)"
+    )
+
+    serialize_parser = commands.add_parser(
+        "serialize", help="measure serialization of cards into JSON"
+    )
+    serialize_parser.add_argument("--cards", type=int, default=10000)
+    serialize_parser.add_argument("--tags-per-card", type=int, default=3)
+    serialize_parser.add_argument("--repeat", type=int, default=5)
+    serialize_parser.add_argument("--seed", type=int, default=0)
+    serialize_parser.add_argument(
+        "--output", help="JSON file (default: stdout)"
+    )
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args)
+        return
+    if args.command == "startup":
+        result = json.dumps(startup(args), indent=2)
+    elif args.command == "concurrency":
+        result = json.dumps(concurrency(args), indent=2)
+    elif args.command == "serialize":
+        result = json.dumps(serialize(args), indent=2)
+    else:
+        unknown = set(args.flows) - set(ALL_FLOWS)
+        if unknown:
+            parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+        result = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Generator of synthetic catalogue of users, tags and cards,
+the same seed always produces the same catalogue.
+"""
+
+import itertools
+import math
+import random
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import Engine, insert, select, update
+
+# Password of all generated users.
+PASSWORD = "benchmark"
+BATCH_SIZE = 1000
+CREATED_AT = datetime(2025, 1, 1)
+WORDS = (
+    "drak meč štít lektvar kouzlo hrad les řeka skřet elf trpaslík čaroděj "
+    "zlato stříbro oheň voda vítr země stín světlo runa svitek prsten "
+    "amulet hůl kniha mapa klíč truhla poklad jeskyně věž most brána "
+    "hráč karta tah kolo útok obrana léčení zranění síla obratnost "
+    "moudrost odvaha strach jed past zvíře vlk medvěd sova had havran"
+).split()
+
+
+def user_name(number: int) -> str:
+    """
+    Get name of generated user.
+
+    Args:
+        number (int): number of user (from 0)
+
+    Returns:
+        str: username
+    """
+    return f"user{number}"
+
+
+def _sentence(rng: random.Random, minimum: int, maximum: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(minimum, maximum))
+    return " ".join(words).capitalize() + "."
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    """
+    Draw number from Poisson distribution (Knuth's algorithm).
+    """
+    limit = math.exp(-mean)
+    count, product = 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _card_tags(
+    rng: random.Random, tag_ids: List[int], weights: List[float], mean: float
+) -> set:
+    """
+    Choose tags of one card, number of tags has Poisson distribution
+    and popularity of tags is given by weights.
+    """
+    count = min(_poisson(rng, mean), len(tag_ids))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(rng.choices(tag_ids, weights, k=count - len(chosen)))
+    return chosen
+
+
+def _insert(connection, table, rows: list):
+    for batch in itertools.batched(rows, BATCH_SIZE):
+        connection.execute(insert(table), list(batch))
+
+
+def seed_catalogue(
+    engine: Engine,
+    users: int = 20,
+    cards: int = 2000,
+    tags: int = 50,
+    tags_per_card: float = 3.0,
+    tag_skew: float = 1.0,
+    seed: int = 0,
+) -> dict:
+    """
+    Drop all tables, initialize database by 'create_db'
+    and fill it with synthetic users, tags and cards.
+    All users have password 'PASSWORD'.
+
+    Args:
+        engine (Engine): engine of database to fill
+        users (int, default: 20): number of users
+        cards (int, default: 2000): number of cards
+        tags (int, default: 50): number of tags (besides initial tags)
+        tags_per_card (float, default: 3.0): mean number of tags of card
+        tag_skew (float, default: 1.0): exponent of Zipf distribution
+                of tag popularity, 0 means all tags are equally used
+        seed (int, default: 0): seed of random generator
+
+    Returns:
+        dict: numbers of created users, tags, cards and card tags
+    """
+    # Modules of application read environment when imported.
+    from cardmaker import models
+    from cardmaker.security import hash_password
+    from create_db import create_db
+    from sqlmodel import SQLModel
+
+    rng = random.Random(seed)
+    SQLModel.metadata.drop_all(engine)
+    create_db()
+
+    # Hashing is slow, so all users share one hash.
+    hashed_password, salt = hash_password(PASSWORD)
+    with engine.begin() as connection:
+        _insert(
+            connection,
+            models.User.__table__,
+            [
+                {
+                    "username": user_name(number),
+                    "hashed_password": hashed_password.decode(),
+                    "salt": salt,
+                }
+                for number in range(users)
+            ],
+        )
+        _insert(
+            connection,
+            models.Tag.__table__,
+            [
+                {"name": f"tag{number}", "description": _sentence(rng, 2, 6)}
+                for number in range(tags)
+            ],
+        )
+        user_ids = (
+            connection.execute(select(models.User.id).order_by(models.User.id))
+            .scalars()
+            .all()
+        )
+        card_type_ids = (
+            connection.execute(
+                select(models.CardType.id).order_by(models.CardType.id)
+            )
+            .scalars()
+            .all()
+        )
+        tag_ids = (
+            connection.execute(select(models.Tag.id).order_by(models.Tag.id))
+            .scalars()
+            .all()
+        )
+        weights = [1 / (rank + 1) ** tag_skew for rank in range(len(tag_ids))]
+
+        card_rows, card_tag_rows = [], []
+        for card_id in range(1, cards + 1):
+            in_set = rng.random() < 0.2
+            card_rows.append(
+                {
+                    "id": card_id,
+                    "name": f"{_sentence(rng, 1, 3)[:-1]} {card_id}",
+                    "fluff": _sentence(rng, 5, 40),
+                    "effect": _sentence(rng, 5, 60),
+                    "in_set": in_set,
+                    "set_name": (
+                        f"Sada {rng.randint(1, 20)}" if in_set else None
+                    ),
+                    "size": None,
+                    "user_id": rng.choice(user_ids),
+                    "card_type_id": rng.choice(card_type_ids),
+                    "revision": card_id,
+                    "created_at": CREATED_AT,
+                    "updated_at": CREATED_AT,
+                }
+            )
+            card_tag_rows += [
+                {"card_id": card_id, "tag_id": tag_id}
+                for tag_id in _card_tags(rng, tag_ids, weights, tags_per_card)
+            ]
+        _insert(connection, models.Card.__table__, card_rows)
+        _insert(connection, models.CardTagRelationship.__table__, card_tag_rows)
+        connection.execute(
+            update(models.RevisionCounter)
+            .where(models.RevisionCounter.name == "cards")
+            .values(value=cards)
+        )
+    return {
+        "users": users,
+        "tags": len(tag_ids),
+        "cards": cards,
+        "card_tags": len(card_tag_rows),
+    }
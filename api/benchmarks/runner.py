@@ -0,0 +1,465 @@
+"""
+Benchmark flows driving API application in-process
+and measurement of their latency, throughput and SQL statements.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List
+
+import httpx
+from sqlalchemy import Engine, event
+
+from .catalogue import PASSWORD, WORDS, user_name
+
+PERCENTILES = (50, 90, 95, 99)
+# Flows reading data, they are warmed up before measurement.
+READ_FLOWS = ("list", "filter", "get")
+
+
+class StatementCounter:
+    """
+    Count SQL statements executed by engine
+    and connections checked out of its pool.
+    """
+
+    def __init__(self, engine: Engine):
+        self.statements = 0
+        self.checkouts = 0
+        event.listen(engine, "before_cursor_execute", self._statement)
+        event.listen(engine.pool, "checkout", self._checkout)
+
+    def _statement(self, *args):
+        self.statements += 1
+
+    def _checkout(self, *args):
+        self.checkouts += 1
+
+    def snapshot(self) -> tuple:
+        """
+        Returns:
+            int: number of statements executed so far
+            int: number of checkouts so far
+        """
+        return self.statements, self.checkouts
+
+
+class BenchmarkState:
+    """
+    Data shared by flows: seeded catalogue, token and created cards.
+    """
+
+    def __init__(self, rng: random.Random, catalogue: dict, cards: int):
+        self.rng = rng
+        self.users = catalogue["users"]
+        self.tags = [f"tag{number}" for number in range(catalogue["tags"])]
+        self.card_ids = list(range(1, cards + 1))
+        self.created = []
+        self.token = None
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def card_data(self) -> dict:
+        rng = self.rng
+        return {
+            "name": " ".join(rng.choices(WORDS, k=3)),
+            "fluff": " ".join(rng.choices(WORDS, k=20)),
+            "effect": " ".join(rng.choices(WORDS, k=30)),
+            "in_set": False,
+            "tags": [{"name": tag} for tag in rng.sample(self.tags, k=2)],
+            "user_id": rng.randint(1, self.users),
+            "card_type_id": rng.randint(1, 5),
+        }
+
+
+def list_request(state: BenchmarkState) -> dict:
+    after = state.rng.choice([None] + state.card_ids[::100])
+    params = {"limit": 100} if after is None else {"limit": 100, "after": after}
+    return {"method": "GET", "url": "/cards", "params": params}
+
+
+def filter_request(state: BenchmarkState) -> dict:
+    rng = state.rng
+    params = rng.choice(
+        [
+            {"user_id": rng.randint(1, state.users)},
+            {"card_type_id": rng.randint(1, 5)},
+            {"tags": ",".join(rng.sample(state.tags, k=2))},
+            {
+                "tags": ",".join(rng.sample(state.tags, k=3)),
+                "tags_match": "any",
+            },
+        ]
+    )
+    return {"method": "GET", "url": "/cards", "params": params}
+
+
+def get_request(state: BenchmarkState) -> dict:
+    return {
+        "method": "GET",
+        "url": f"/cards/{state.rng.choice(state.card_ids)}",
+    }
+
+
+def create_request(state: BenchmarkState) -> dict:
+    return {
+        "method": "POST",
+        "url": "/cards",
+        "json": state.card_data(),
+        "headers": state.headers,
+    }
+
+
+def update_request(state: BenchmarkState) -> dict:
+    data = state.card_data()
+    del data["user_id"], data["card_type_id"]
+    return {
+        "method": "PUT",
+        "url": f"/cards/{state.rng.choice(state.card_ids)}",
+        "json": data,
+        "headers": state.headers,
+    }
+
+
+def delete_request(state: BenchmarkState) -> dict | None:
+    if not state.created:
+        return None
+    card_id = state.created.pop()
+    return {
+        "method": "DELETE",
+        "url": f"/cards/{card_id}",
+        "headers": state.headers,
+    }
+
+
+def login_request(state: BenchmarkState) -> dict:
+    username = user_name(state.rng.randrange(state.users))
+    return {
+        "method": "POST",
+        "url": "/users/me",
+        "json": {"username": username, "password": PASSWORD},
+    }
+
+
+FLOWS: Dict[str, Callable[[BenchmarkState], dict | None]] = {
+    "list": list_request,
+    "filter": filter_request,
+    "get": get_request,
+    "create": create_request,
+    "update": update_request,
+    "delete": delete_request,
+    "login": login_request,
+}
+
+
+# Flows mixing concurrent requests of several kinds.
+MIXED_FLOWS = ("login_storm",)
+
+
+def summarize(latencies: List[float]) -> dict:
+    """
+    Compute statistics of latencies.
+
+    Args:
+        latencies (List[float]): latencies in seconds
+
+    Returns:
+        dict: mean, minimum, percentiles and maximum in milliseconds
+    """
+    if not latencies:
+        return {}
+    milliseconds = [1000 * latency for latency in latencies]
+    if len(milliseconds) > 1:
+        cuts = statistics.quantiles(milliseconds, n=100, method="inclusive")
+    else:
+        cuts = milliseconds * 99
+    summary = {
+        "mean": statistics.fmean(milliseconds),
+        "min": min(milliseconds),
+    }
+    for percentile in PERCENTILES:
+        summary[f"p{percentile}"] = cuts[percentile - 1]
+    summary["max"] = max(milliseconds)
+    return {key: round(value, 3) for key, value in summary.items()}
+
+
+async def run_flow(
+    client: httpx.AsyncClient,
+    state: BenchmarkState,
+    name: str,
+    count: int,
+    concurrency: int,
+    counter: StatementCounter,
+) -> dict:
+    """
+    Send 'count' requests of flow by 'concurrency' concurrent workers.
+    Requests are generated before sending, so they do not depend
+    on order of responses.
+
+    Args:
+        client (httpx.AsyncClient): client of API application
+        state (BenchmarkState): shared data of flows
+        name (str): name of flow in 'FLOWS'
+        count (int): number of requests
+        concurrency (int): number of concurrent requests
+        counter (StatementCounter): counter of SQL statements
+
+    Returns:
+        dict: number of requests and errors, throughput, latency
+                statistics and SQL statements per request
+    """
+    requests = [FLOWS[name](state) for _ in range(count)]
+    requests = [request for request in requests if request is not None]
+    pending = iter(requests)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for request in pending:
+            start = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            elif name == "create":
+                state.created.append(response.json()["card_id"])
+
+    statements, checkouts = counter.snapshot()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    total = max(len(requests), 1)
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(requests) / duration, 1) if duration else 0,
+        "latency_ms": summarize(latencies),
+        "sql_statements_per_request": round(
+            (counter.statements - statements) / total, 2
+        ),
+        "connection_checkouts_per_request": round(
+            (counter.checkouts - checkouts) / total, 2
+        ),
+    }
+
+
+async def run_login_storm(
+    client: httpx.AsyncClient,
+    state: BenchmarkState,
+    logins: int,
+    counter: StatementCounter,
+) -> dict:
+    """
+    Send 'logins' login requests at once and meanwhile poll 'GET /cards'
+    one request after another until all logins are answered.
+    Latency of polling should not depend on logins waiting
+    for password hashing.
+
+    Args:
+        client (httpx.AsyncClient): client of API application
+        state (BenchmarkState): shared data of flows
+        logins (int): number of concurrent login requests
+        counter (StatementCounter): counter of SQL statements
+
+    Returns:
+        dict: statistics of polling (same keys as 'run_flow'),
+                durations of logins and numbers of rejected logins
+    """
+    statuses = []
+    login_latencies = []
+
+    async def login():
+        start = time.perf_counter()
+        response = await client.request(**login_request(state))
+        login_latencies.append(time.perf_counter() - start)
+        statuses.append(response.status_code)
+
+    storm = asyncio.gather(*(login() for _ in range(logins)))
+    latencies = []
+    errors = 0
+    statements, checkouts = counter.snapshot()
+    start = time.perf_counter()
+    while not storm.done() or not latencies:
+        request_start = time.perf_counter()
+        response = await client.request(**list_request(state))
+        latencies.append(time.perf_counter() - request_start)
+        if response.status_code >= 400:
+            errors += 1
+    duration = time.perf_counter() - start
+    await storm
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total / duration, 1) if duration else 0,
+        "latency_ms": summarize(latencies),
+        "sql_statements_per_request": round(
+            (counter.statements - statements) / total, 2
+        ),
+        "connection_checkouts_per_request": round(
+            (counter.checkouts - checkouts) / total, 2
+        ),
+        "logins": logins,
+        "logins_rejected": statuses.count(503),
+        "login_errors": sum(
+            1 for status in statuses if status >= 400 and status != 503
+        ),
+        "login_latency_ms": summarize(login_latencies),
+    }
+
+
+async def run_benchmark(
+    app,
+    engine: Engine,
+    catalogue: dict,
+    flows: List[str],
+    requests: int,
+    login_requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int,
+    storm_logins: int = 18,
+) -> Dict[str, dict]:
+    """
+    Run flows one after another against in-process application.
+
+    Args:
+        app: ASGI application
+        engine (Engine): engine used by application
+        catalogue (dict): numbers of seeded rows from 'seed_catalogue'
+        flows (List[str]): names of flows in order of running
+        requests (int): number of requests of each flow except login
+        login_requests (int): number of login requests
+                (password hashing is intentionally slow)
+        concurrency (int): number of concurrent requests
+        warmup (int): number of unmeasured requests of reading flows
+        seed (int): seed of random generator of requests
+        storm_logins (int, default: 18): number of concurrent logins
+                of flow 'login_storm'
+
+    Returns:
+        Dict[str, dict]: results of flows by name
+    """
+    state = BenchmarkState(random.Random(seed), catalogue, catalogue["cards"])
+    counter = StatementCounter(engine)
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        response = await client.request(**login_request(state))
+        response.raise_for_status()
+        state.token = response.json()["access_token"]
+        for name in flows:
+            if name == "login_storm":
+                results[name] = await run_login_storm(
+                    client, state, storm_logins, counter
+                )
+                continue
+            if warmup and name in READ_FLOWS:
+                await run_flow(
+                    client, state, name, warmup, concurrency, counter
+                )
+            count = login_requests if name == "login" else requests
+            results[name] = await run_flow(
+                client, state, name, count, concurrency, counter
+            )
+    return results
+
+
+class InlineExecutor(Executor):
+    """
+    Executor running calls at once in calling thread. Used instead
+    of database thread pool, database calls block event loop
+    as they did before the pool was introduced.
+    """
+
+    def submit(self, function, /, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+async def run_concurrency(
+    app,
+    engine: Engine,
+    catalogue: dict,
+    flow: str,
+    levels: List[int],
+    requests: int,
+    warmup: int,
+    seed: int,
+    query_delay: float = 0.0,
+) -> Dict[str, dict]:
+    """
+    Run one flow at several concurrency levels with database sessions
+    in thread pool ('thread_pool') and on event loop ('blocking').
+    Both modes send the same requests.
+
+    Args:
+        app: ASGI application
+        engine (Engine): engine used by application
+        catalogue (dict): numbers of seeded rows from 'seed_catalogue'
+        flow (str): name of flow in 'FLOWS'
+        levels (List[int]): numbers of concurrent requests
+        requests (int): number of requests at each level
+        warmup (int): number of unmeasured requests at each level
+        seed (int): seed of random generator of requests
+        query_delay (float, default: 0.0): seconds added to each
+                SQL statement, simulates network round trip to database
+                (SQLite runs in process)
+
+    Returns:
+        Dict[str, dict]: results of flow (described in 'run_flow')
+                by mode and concurrency level
+    """
+    from cardmaker import database
+
+    def delay(*args):
+        time.sleep(query_delay)
+
+    state = BenchmarkState(random.Random(seed), catalogue, catalogue["cards"])
+    counter = StatementCounter(engine)
+    if query_delay:
+        event.listen(engine, "before_cursor_execute", delay)
+    pool = database.executor
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            response = await client.request(**login_request(state))
+            response.raise_for_status()
+            state.token = response.json()["access_token"]
+            for mode, executor in (
+                ("thread_pool", pool),
+                ("blocking", InlineExecutor()),
+            ):
+                database.executor = executor
+                results[mode] = {}
+                for level in levels:
+                    state.rng = random.Random(seed)
+                    if warmup:
+                        await run_flow(
+                            client, state, flow, warmup, level, counter
+                        )
+                    results[mode][str(level)] = await run_flow(
+                        client, state, flow, requests, level, counter
+                    )
+    finally:
+        database.executor = pool
+        if query_delay:
+            event.remove(engine, "before_cursor_execute", delay)
+    return results
@@ -0,0 +1,125 @@
+"""
+Micro-benchmark of serialization of cards into body of JSON response,
+no database or http request is involved.
+"""
+
+import json
+import random
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from cardmaker import models
+from cardmaker.endpoints import card_to_dict
+from cardmaker.utils import ModelJSONResponse
+
+from .catalogue import CREATED_AT, _sentence
+from .runner import summarize
+
+
+def build_cards(
+    count: int, tags: int = 50, tags_per_card: int = 3, seed: int = 0
+) -> List[models.Card]:
+    """
+    Build cards with loaded tags in memory, text of cards is generated
+    in the same way as in 'seed_catalogue'.
+
+    Args:
+        count (int): number of cards
+        tags (int, default: 50): number of distinct tags
+        tags_per_card (int, default: 3): number of tags of each card
+        seed (int, default: 0): seed of random generator
+
+    Returns:
+        List[models.Card]: cards with 'tag_list'
+    """
+    rng = random.Random(seed)
+    tag_list = [
+        models.Tag(
+            id=number, name=f"tag{number}", description=_sentence(rng, 2, 6)
+        )
+        for number in range(1, tags + 1)
+    ]
+    return [
+        models.Card(
+            id=number,
+            name=_sentence(rng, 1, 4),
+            fluff=_sentence(rng, 10, 40),
+            effect=_sentence(rng, 20, 80),
+            in_set=False,
+            user_id=1,
+            card_type_id=1,
+            revision=number,
+            created_at=CREATED_AT,
+            updated_at=CREATED_AT,
+            tag_list=rng.sample(tag_list, tags_per_card),
+        )
+        for number in range(1, count + 1)
+    ]
+
+
+def validated_body(cards: List[models.Card]) -> bytes:
+    """
+    Serialize cards as endpoints did before 'card_to_dict':
+    validated CardGet models encoded by 'jsonable_encoder'.
+    """
+    content = [
+        models.CardGet.model_validate(
+            card.model_dump(),
+            update={
+                "tags": [
+                    models.TagBase.model_validate(tag) for tag in card.tag_list
+                ]
+            },
+        )
+        for card in cards
+    ]
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def dict_body(cards: List[models.Card]) -> bytes:
+    """
+    Serialize cards as endpoints do: 'card_to_dict' and 'ModelJSONResponse'.
+    """
+    return ModelJSONResponse([card_to_dict(card) for card in cards]).body
+
+
+SERIALIZERS: Dict[str, Callable[[List[models.Card]], bytes]] = {
+    "model_validate+jsonable_encoder": validated_body,
+    "card_to_dict+to_json": dict_body,
+}
+
+
+def run_serialization(cards: List[models.Card], repeat: int = 5) -> dict:
+    """
+    Serialize cards by each serializer 'repeat' times.
+
+    Args:
+        cards (List[models.Card]): serialized cards
+        repeat (int, default: 5): measured runs of each serializer
+
+    Returns:
+        dict: statistics of runs, time per card and size of body
+                by serializer
+    """
+    results = {}
+    bodies = {}
+    for name, serializer in SERIALIZERS.items():
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            bodies[name] = serializer(cards)
+            durations.append(time.perf_counter() - start)
+        summary = summarize(durations)
+        results[name] = {
+            "duration_ms": summary,
+            "per_card_us": round(1000 * summary["min"] / len(cards), 2),
+            "body_bytes": len(bodies[name]),
+        }
+    documents = [json.loads(body) for body in bodies.values()]
+    results["same_content"] = all(
+        document == documents[0] for document in documents
+    )
+    return results
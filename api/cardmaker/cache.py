@@ -0,0 +1,232 @@
+"""
+In-process cache with time to live and LRU eviction
+and on-disk cache of size limited by number of bytes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+
+class TTLCache:
+    """
+    Thread safe cache of limited size, entries expire after 'ttl' seconds.
+    Keys are tuples, first item of key is name of database table,
+    which allows to invalidate all entries depending on one table.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Hashable, ...]) -> Tuple[bool, Any]:
+        """
+        Get value from cache.
+
+        Args:
+            key (tuple): key of entry
+
+        Returns:
+            bool: True if valid entry was found
+            Any: cached value or None
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(
+        self, key: Tuple[Hashable, ...], value: Any, ttl: float | None = None
+    ):
+        """
+        Save value into cache, evict least recently used entry if full.
+
+        Args:
+            key (tuple): key of entry
+            value (Any): value to cache
+            ttl (float|None, default: None):
+                    time to live of this entry (at most 'self.ttl'),
+                    'self.ttl' is used if None
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, table: str | None = None):
+        """
+        Remove entries depending on given table or all entries.
+
+        Args:
+            table (str|None, default: None):
+                    name of table, all entries are removed if None
+        """
+        with self._lock:
+            if table is None:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if key[0] == table]:
+                del self._data[key]
+
+    def stats(self) -> dict:
+        """
+        Get statistics of cache usage.
+
+        Returns:
+            dict: number of hits, misses and entries
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+            }
+
+
+class DiskCache:
+    """
+    Thread safe cache of bytes values stored in files of one directory,
+    least recently used files are removed if total size exceeds 'maxbytes'.
+    Directory can be shared by several processes,
+    time of last access of entry is modification time of its file.
+    """
+
+    def __init__(self, directory: str, maxbytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _scan(self) -> list:
+        """
+        List entries in directory sorted from least recently used.
+
+        Returns:
+            list: modification time, size and path of each entry
+        """
+        try:
+            entries = [
+                (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                for entry in os.scandir(self.directory)
+                if entry.is_file() and not entry.name.endswith(".tmp")
+            ]
+        except FileNotFoundError:
+            return []
+        return sorted(entries)
+
+    def get(self, key: str) -> Tuple[bool, bytes | None]:
+        """
+        Get value from cache and mark it as recently used.
+
+        Args:
+            key (str): key of entry, must be valid file name
+
+        Returns:
+            bool: True if entry was found
+            bytes: cached value or None
+        """
+        try:
+            with open(self._path(key), "rb") as file:
+                value = file.read()
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False, None
+        with self._lock:
+            self.hits += 1
+        return True, value
+
+    def set(self, key: str, value: bytes):
+        """
+        Save value into cache, evict least recently used entries if full.
+        Cache is not used if 'maxbytes' is 0.
+
+        Args:
+            key (str): key of entry, must be valid file name
+            value (bytes): value to cache
+        """
+        if len(value) > self.maxbytes:
+            return
+        path = self._path(key)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{path}.{threading.get_ident()}.tmp", "wb") as file:
+            file.write(value)
+        with self._lock:
+            # Size of replaced entry is not counted twice
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(file.name, path)
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += len(value) - replaced
+            if self._size > self.maxbytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Remove least recently used entries until cache is filled
+        at most to 90 % of 'maxbytes'. Lock must be held.
+        """
+        entries = self._scan()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.maxbytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def remove(self, key: str):
+        """
+        Remove entry from cache if exists.
+
+        Args:
+            key (str): key of entry
+        """
+        try:
+            size = os.path.getsize(self._path(key))
+            os.remove(self._path(key))
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def stats(self) -> dict:
+        """
+        Get statistics of cache usage.
+
+        Returns:
+            dict: number of hits, misses and entries and total size in bytes
+        """
+        entries = self._scan()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+            }
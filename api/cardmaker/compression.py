@@ -0,0 +1,270 @@
+"""
+ASGI middleware compressing responses by brotli or gzip
+according to 'Accept-Encoding' header of request.
+"""
+
+import os
+import zlib
+from typing import Tuple
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .cache import TTLCache
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "500"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Supported encodings in order of preference.
+ENCODINGS = ("br", "gzip")
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+)
+
+# Compressed bodies of responses with strong ETag, key contains path,
+# query, ETag and encoding, so hot response is compressed only once.
+# Entries expire together with ETags.
+compressed_cache = TTLCache(
+    maxsize=int(os.getenv("COMPRESSION_CACHE_SIZE", "64")),
+    ttl=float(os.getenv("CACHE_TTL", "60")),
+)
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """
+    Choose supported encoding with highest quality in 'Accept-Encoding'.
+
+    Args:
+        accept_encoding (str): value of 'Accept-Encoding' header
+
+    Returns:
+        str|None: 'br', 'gzip' or None if no supported encoding is accepted
+    """
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, parameters = item.partition(";")
+        quality = 1.0
+        parameter = parameters.strip().replace(" ", "")
+        if parameter.startswith("q="):
+            try:
+                quality = float(parameter[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip()] = quality
+    default = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    Add encoding into ETag, so compressed and identity representations
+    have different strong ETags.
+
+    Args:
+        etag (str): quoted ETag
+        encoding (str): content encoding
+
+    Returns:
+        str: quoted ETag with encoding suffix
+    """
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(etag: str) -> str:
+    """
+    Remove encoding added by 'encoded_etag' from ETag.
+
+    Args:
+        etag (str): quoted ETag
+
+    Returns:
+        str: quoted ETag of identity representation
+    """
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return f'{etag[: -len(suffix)]}"'
+    return etag
+
+
+class Compressor:
+    """
+    Incremental compressor with common interface for gzip and brotli.
+    """
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self.compress = compressor.process
+            self.finish = compressor.finish
+        else:
+            compressor = zlib.compressobj(
+                COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+            self.compress = compressor.compress
+            self.finish = compressor.flush
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compress whole body.
+
+    Args:
+        body (bytes): data to compress
+        encoding (str): 'br' or 'gzip'
+
+    Returns:
+        bytes: compressed data
+    """
+    compressor = Compressor(encoding)
+    return compressor.compress(body) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of compressible media type larger than
+    'minimum_size' bytes. Streamed responses are compressed incrementally,
+    complete responses with strong ETag are compressed once per ETag.
+    Responses already having 'Content-Encoding' are sent unchanged.
+    """
+
+    def __init__(
+        self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(
+            Headers(scope=scope).get("accept-encoding", "")
+        )
+        responder = _CompressionResponder(
+            scope, send, encoding, self.minimum_size
+        )
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    """
+    Send function of one response, start message is held
+    until first part of body decides whether to compress.
+    """
+
+    def __init__(
+        self, scope: Scope, send: Send, encoding: str | None, minimum_size: int
+    ):
+        self.scope = scope
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        return (
+            self.start["status"] >= 200
+            and self.start["status"] not in (204, 304)
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _encode_not_modified(self):
+        """
+        Set ETag of 304 response to ETag of representation client
+        validates, i.e. encoded ETag if client sent it. Small responses
+        are not compressed, so encoding alone does not decide it.
+        """
+        headers = MutableHeaders(raw=self.start["headers"])
+        etag = headers.get("etag")
+        if self.encoding is None or not etag or not etag.endswith('"'):
+            return
+        encoded = encoded_etag(etag, self.encoding)
+        header = Headers(scope=self.scope).get("if-none-match", "")
+        if encoded in (
+            tag.strip().removeprefix("W/") for tag in header.split(",")
+        ):
+            headers["ETag"] = encoded
+            headers.add_vary_header("Accept-Encoding")
+
+    def _cache_key(self, etag: str | None) -> Tuple[str, ...] | None:
+        if not etag or etag.startswith("W/"):
+            return None
+        query = self.scope.get("query_string", b"").decode("latin-1")
+        return (self.scope["path"], query, etag, self.encoding)
+
+    async def __call__(self, message: Message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            if message["status"] == 304:
+                self._encode_not_modified()
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.compressor is not None:
+            await self._send_compressed(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+        compressible = self._compressible(headers)
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        if (
+            not compressible
+            or self.encoding is None
+            or (not more_body and len(body) < self.minimum_size)
+        ):
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        etag = headers.get("etag")
+        headers["Content-Encoding"] = self.encoding
+        if etag and etag.endswith('"'):
+            headers["ETag"] = encoded_etag(etag, self.encoding)
+        if more_body:
+            del headers["Content-Length"]
+            self.compressor = Compressor(self.encoding)
+            await self.send(self.start)
+            await self._send_compressed(message)
+            return
+
+        key = self._cache_key(etag)
+        found, compressed = compressed_cache.get(key) if key else (False, None)
+        if not found:
+            compressed = compress(body, self.encoding)
+            if key:
+                compressed_cache.set(key, compressed)
+        headers["Content-Length"] = str(len(compressed))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed})
+
+    async def _send_compressed(self, message: Message):
+        body = self.compressor.compress(message.get("body", b""))
+        more_body = message.get("more_body", False)
+        if not more_body:
+            body += self.compressor.finish()
+        elif not body:
+            return
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -1,24 +1,361 @@
+import asyncio
+import contextvars
+import itertools
 import os
-from typing import List, Callable
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterator, List, Literal, Tuple
 from functools import wraps
 
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy import delete, func, insert, inspect, make_url, update
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, SQLModel, and_, create_engine, select
 
 from . import models
+from .cache import TTLCache
+from .instrumentation import instrument_engine
 from .logger import Logger
+from .search import InvertedIndex
 
 logger = Logger.get_instance()
 
+STREAM_BATCH_SIZE = 500
+# Rows of one multi-row insert of bulk import.
+BULK_INSERT_BATCH_SIZE = 500
+# 'fulltext' (MySQL FULLTEXT index), 'local' ('search_index')
+# or 'auto' (FULLTEXT if database is MySQL)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_INDEX_REFRESH = float(os.getenv("SEARCH_INDEX_REFRESH", "10"))
+
+# Blocking database calls are executed in this bounded thread pool,
+# so a slow query does not stall the event loop.
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DATABASE_THREADS", "10")),
+    thread_name_prefix="cardmaker-db",
+)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Get database engine shared by the whole process.
+    Engine is created on first call, its connection pool is configured
+    by environment variables 'DATABASE_POOL_SIZE', 'DATABASE_MAX_OVERFLOW',
+    'DATABASE_POOL_RECYCLE' (seconds) and 'DATABASE_POOL_PRE_PING'.
+
+    Returns:
+        sqlalchemy.Engine: shared engine
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            url = make_url(os.getenv("DATABASE_URL"))
+            options = {
+                "pool_recycle": int(os.getenv("DATABASE_POOL_RECYCLE", "3600")),
+                "pool_pre_ping": os.getenv("DATABASE_POOL_PRE_PING", "true")
+                == "true",
+            }
+            if url.get_backend_name() != "sqlite":
+                options["pool_size"] = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+                options["max_overflow"] = int(
+                    os.getenv("DATABASE_MAX_OVERFLOW", "10")
+                )
+            _engine = create_engine(url, **options)
+            instrument_engine(_engine)
+            logger.info("Database engine created with options %s.", options)
+    return _engine
+
+
+def dispose_engine():
+    """
+    Close all connections of shared engine,
+    next call of 'get_engine' creates a new engine.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def _reset_engine_after_fork():
+    # Forked worker must not use connections of parent process,
+    # it creates its own engine and pool on first use.
+    global _engine, _engine_lock
+    _engine_lock = threading.Lock()
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine = None
+
+
+os.register_at_fork(after_in_child=_reset_engine_after_fork)
+
+
+def pool_status() -> dict:
+    """
+    Get usage of connection pool of shared engine.
+
+    Returns:
+        dict: number of checked out, idle and overflow connections
+    """
+    pool = get_engine().pool
+    if not isinstance(pool, QueuePool):
+        return {"status": pool.status()}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+# Cache of rarely changing reference data (users, card types, tags),
+# entries are invalidated by writes of this process or expire after TTL.
+cache = TTLCache(
+    maxsize=int(os.getenv("CACHE_SIZE", "256")),
+    ttl=float(os.getenv("CACHE_TTL", "60")),
+)
+
+# Revision of each table, incremented by every write of this process
+# and when revision counter of the table is changed by other process.
+revisions = {}
+_revisions_lock = threading.Lock()
+
+# Revision counter (model RevisionCounter) of each table shared
+# by all processes. Tags are changed only together with cards,
+# so they share counter of cards.
+REVISION_COUNTERS = {
+    "cards": "cards",
+    "tags": "cards",
+    "users": "users",
+    "card_types": "card_types",
+}
+# Latest values of revision counters read by this process.
+_counter_values = {}
+
+
+def touch(*tables: str):
+    """
+    Mark tables as changed: increment their revisions
+    and invalidate cached results depending on them.
+
+    Args:
+        tables (str): names of changed tables
+    """
+    with _revisions_lock:
+        for table in tables:
+            revisions[table] = revisions.get(table, 0) + 1
+    for table in tables:
+        cache.invalidate(table)
+
+
+def observe_counters(values: dict):
+    """
+    Invalidate cached results of tables whose revision counters
+    were increased since they were last read (e.g. by other process).
+
+    Args:
+        values (dict): values of revision counters by name
+    """
+    changed = []
+    with _revisions_lock:
+        for name, value in values.items():
+            if value > _counter_values.get(name, -1):
+                _counter_values[name] = value
+                changed.extend(
+                    table
+                    for table, counter in REVISION_COUNTERS.items()
+                    if counter == name
+                )
+    touch(*changed)
+
+
+def get_revisions(*tables: str) -> tuple:
+    """
+    Get current revisions of tables.
+
+    Args:
+        tables (str): names of tables
+
+    Returns:
+        tuple: revision of each table
+    """
+    with _revisions_lock:
+        return tuple(revisions.get(table, 0) for table in tables)
+
+
+# Local full-text index of cards, it is built at startup,
+# updated by writes of this process and refreshed by changes
+# of other processes at most once per 'SEARCH_INDEX_REFRESH' seconds.
+search_index = InvertedIndex()
+_search_index_lock = threading.Lock()
+
+
+def search_fields(card: models.Card) -> dict:
+    """
+    Get text of card indexed by 'search_index'.
+    """
+    return {"name": card.name, "fluff": card.fluff, "effect": card.effect}
+
+
+# Columns of cards read into 'search_index'.
+SEARCH_COLUMNS = (
+    models.Card.id,
+    models.Card.name,
+    models.Card.fluff,
+    models.Card.effect,
+)
+
+
+def cached(table: str):
+    """
+    Cache result of database method in 'cache'.
+    Result is invalidated when given table is changed.
+    None (not found) is not cached, row created by other process
+    is found at once.
+
+    Args:
+        table (str): name of table the result depends on
+    """
+
+    def decorator(function: Callable):
+        @wraps(function)
+        async def wrapper(self, *args, **kwargs):
+            # Revision in key, so result loaded before table was changed
+            # is not returned after the change
+            key = (
+                table,
+                get_revisions(table),
+                function.__name__,
+                args,
+                *sorted(kwargs.items()),
+            )
+            hit, value = cache.get(key)
+            if not hit:
+                value = await function(self, *args, **kwargs)
+                if value is not None:
+                    detach(value)
+                    cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def detach(value: SQLModel | List[SQLModel] | None):
+    """
+    Remove instances from session of current unit of work,
+    so they can be cached and shared by other requests.
+    """
+    for instance in value if isinstance(value, list) else [value]:
+        state = inspect(instance, raiseerr=False)
+        if state is not None and state.session is not None:
+            state.session.expunge(instance)
+
+
+# Unit of work of current request, set by 'utils.session_scope'.
+current_unit = contextvars.ContextVar("current_unit", default=None)
+
+
+class UnitOfWork:
+    """
+    Database session shared by all database calls of one request.
+    Session is opened by first database call, write methods only flush
+    their changes and all changes are committed once by 'commit'.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.tables = set()
+        self.callbacks = []
+
+    def get_session(self) -> Session:
+        """
+        Get session of unit of work, open it on first call.
+        """
+        if self.session is None:
+            self.session = Session(get_engine(), expire_on_commit=False)
+        return self.session
+
+    def _commit(self):
+        try:
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            raise IOError(f"Database operation failed! {e}")
+        touch(*self.tables)
+        for callback in self.callbacks:
+            callback()
+
+    async def commit(self):
+        """
+        Commit changes of all database calls or raise IOError,
+        caches of changed tables are invalidated.
+        """
+        if self.session is not None and self.tables:
+            context = contextvars.copy_context()
+            await asyncio.get_running_loop().run_in_executor(
+                executor, context.run, self._commit
+            )
+
+    async def close(self):
+        """
+        Close session, uncommitted changes are rolled back.
+        """
+        if self.session is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, self.session.close
+            )
+
+    async def release(self):
+        """
+        Close session without changes, so its connection is returned
+        into pool before awaiting work without database (e.g. password
+        hashing). Next database call opens a new session.
+        Session with uncommitted changes is kept.
+        """
+        if self.session is not None and not self.tables:
+            await self.close()
+            self.session = None
+
+
+async def release_connection():
+    """
+    Return connection of current unit of work into pool,
+    see 'UnitOfWork.release'.
+    """
+    unit = current_unit.get()
+    if unit is not None:
+        await unit.release()
+
 
 def session_wrapper(function: Callable):
     """
-    Wrap method into database session.
+    Wrap blocking method into database session
+    and make it awaitable by running it in database thread pool.
+    Session of current unit of work is used if there is one.
     """
 
     @wraps(function)
     async def wrapper(self, *args, **kwargs):
-        with Session(self.engine) as session:
-            return await function(self, session, *args, **kwargs)
+        def run():
+            unit = current_unit.get()
+            if unit is not None:
+                return function(self, unit.get_session(), *args, **kwargs)
+            with Session(self.engine) as session:
+                return function(self, session, *args, **kwargs)
+
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, context.run, run
+        )
 
     return wrapper
 
@@ -28,11 +365,12 @@ class CardMakerDatabase:
     Class for communication with database
     """
 
-    def __init__(self):
-        self.engine = create_engine(os.getenv("DATABASE_URL"))
+    @property
+    def engine(self):
+        return get_engine()
 
     @session_wrapper
-    async def save_into_db(self, session, instance: SQLModel) -> SQLModel:
+    def save_into_db(self, session, instance: SQLModel) -> SQLModel:
         """
         Save instance into database or raise IOError.
 
@@ -46,18 +384,10 @@ class CardMakerDatabase:
         Raises:
             IOError: if cannot save data into database
         """
-        try:
-            session.add(instance)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise IOError(f"Database operation failed! {e}")
-        session.refresh(instance)
-        logger.info(f"Instance {instance} saved into db.")
-        return instance
+        return self._save(session, instance)
 
     @session_wrapper
-    async def delete_id_db(self, session, instance: SQLModel):
+    def delete_id_db(self, session, instance: SQLModel):
         """
         Delete instance from database or raise IOError.
 
@@ -68,15 +398,165 @@ class CardMakerDatabase:
         Raises:
             IOError: if cannot delete instance from database
         """
+        self._delete(session, instance)
+
+    def _save(self, session, instance: SQLModel) -> SQLModel:
+        """
+        Save instance in given session, described in 'save_into_db'.
+        """
+        try:
+            if isinstance(instance, models.Card):
+                self._stamp_cards(session, [instance])
+            session.add(instance)
+            self._commit(session, instance.__tablename__)
+        except Exception as e:
+            session.rollback()
+            raise IOError(f"Database operation failed! {e}")
+        self._refresh(session, instance)
+        if isinstance(instance, models.Card):
+            self._after_commit(
+                session, search_index.add, instance.id, search_fields(instance)
+            )
+        logger.info(
+            "%s %s saved into db.", type(instance).__name__, instance.id
+        )
+        return instance
+
+    def _delete(self, session, instance: SQLModel):
+        """
+        Delete instance in given session, described in 'delete_id_db'.
+        """
+        instance_id = instance.id
         try:
             session.delete(instance)
-            session.commit()
+            if isinstance(instance, models.Card):
+                session.merge(
+                    models.CardTombstone(
+                        card_id=instance_id,
+                        revision=self._next_revisions(session),
+                        deleted_at=datetime.now(),
+                    )
+                )
+            self._commit(session, instance.__tablename__)
         except Exception as e:
             session.rollback()
             raise IOError(f"Database operation failed! {e}")
+        if isinstance(instance, models.Card):
+            self._after_commit(session, search_index.remove, instance_id)
+
+    @staticmethod
+    def _commit(session, *tables: str):
+        """
+        Commit changes of session and invalidate caches of changed tables.
+        Changes in session of unit of work are only flushed,
+        they are committed by unit of work.
+        """
+        unit = current_unit.get()
+        # Counter of cards is increased by stamping of changed cards
+        counters = {REVISION_COUNTERS.get(table, table) for table in tables}
+        for name in sorted(counters - {"cards"}):
+            CardMakerDatabase._next_revisions(session, name=name)
+        if unit is not None and unit.session is session:
+            session.flush()
+            unit.tables.update(tables)
+        else:
+            session.commit()
+        touch(*tables)
+
+    @staticmethod
+    def _refresh(session, instance: SQLModel):
+        """
+        Load attributes of instance expired by commit.
+        """
+        if inspect(instance).expired_attributes:
+            session.refresh(instance)
+
+    @staticmethod
+    def _after_commit(session, callback: Callable, *args):
+        """
+        Call callback after changes of session are committed.
+        """
+        unit = current_unit.get()
+        if unit is not None and unit.session is session:
+            unit.callbacks.append(lambda: callback(*args))
+        else:
+            callback(*args)
+
+    @staticmethod
+    def _next_revisions(session, count: int = 1, name: str = "cards") -> int:
+        """
+        Reserve 'count' consecutive revisions of cards in given session.
+        Counter row stays locked until end of transaction,
+        so transactions are committed in order of their revisions.
+
+        Args:
+            count (int, default: 1): number of revisions
+            name (str, default: 'cards'): name of revision counter
+
+        Returns:
+            int: first reserved revision
+        """
+        counter = models.RevisionCounter
+        with session.no_autoflush:
+            updated = session.execute(
+                update(counter)
+                .where(counter.name == name)
+                .values(value=counter.value + count)
+            ).rowcount
+            if not updated:
+                session.execute(insert(counter).values(name=name, value=0))
+                return CardMakerDatabase._next_revisions(session, count, name)
+            value = session.execute(
+                select(counter.value).where(counter.name == name)
+            ).scalar_one()
+        return value - count + 1
+
+    def _stamp_cards(self, session, cards: List[models.Card]):
+        """
+        Set new revision and time of change of created or updated cards.
+        """
+        revision = self._next_revisions(session, len(cards))
+        now = datetime.now()
+        for card in cards:
+            card.revision = revision
+            card.updated_at = now
+            card.created_at = card.created_at or now
+            revision += 1
 
     @session_wrapper
-    async def get_users(self, session) -> List[models.UserPublic | None]:
+    def get_table_revisions(self, session, *tables: str) -> tuple:
+        """
+        Get revisions of tables from their revision counters,
+        cached results of tables changed by other processes
+        are invalidated.
+
+        Args:
+            tables (str): names of tables
+
+        Returns:
+            tuple: revision of each table
+
+        Raises:
+            IOError: when cannot read revision counters
+        """
+        names = [REVISION_COUNTERS.get(table, table) for table in tables]
+        counter = models.RevisionCounter
+        try:
+            values = dict(
+                session.execute(
+                    select(counter.name, counter.value).where(
+                        counter.name.in_(set(names))
+                    )
+                ).all()
+            )
+        except Exception as e:
+            raise IOError(f"Database operation failed! {e}")
+        observe_counters(values)
+        return tuple(values.get(name, 0) for name in names)
+
+    @cached("users")
+    @session_wrapper
+    def get_users(self, session) -> List[models.UserPublic | None]:
         """
         Get all users from database.
 
@@ -89,8 +569,9 @@ class CardMakerDatabase:
             for db_user in session.execute(statement).scalars().all()
         ]
 
+    @cached("card_types")
     @session_wrapper
-    async def get_card_types(self, session) -> List[models.CardType | None]:
+    def get_card_types(self, session) -> List[models.CardType | None]:
         """
         Get all card types from database.
 
@@ -100,8 +581,9 @@ class CardMakerDatabase:
         statement = select(models.CardType)
         return session.execute(statement).scalars().all()
 
+    @cached("tags")
     @session_wrapper
-    async def get_tags(self, session) -> List[models.Tag | None]:
+    def get_tags(self, session) -> List[models.Tag | None]:
         """
         Get all tags from database.
 
@@ -111,16 +593,93 @@ class CardMakerDatabase:
         statement = select(models.Tag)
         return session.execute(statement).scalars().all()
 
+    @staticmethod
+    def _card_has_tags(tag_names: List[str], tags_match: str = "all"):
+        """
+        Build filtering condition of cards by names of their tags.
+        Each tag is checked by 'EXISTS' subquery on relationship table.
+
+        Args:
+            tag_names (List[str]): names of tags
+            tags_match (str, default: 'all'):
+                            'all' if card must have all tags,
+                            'any' if card must have at least one of tags
+
+        Returns:
+            condition usable in 'where' clause of cards select
+        """
+
+        def has_tag(*condition):
+            return (
+                select(models.CardTagRelationship)
+                .join(
+                    models.Tag,
+                    models.Tag.id == models.CardTagRelationship.tag_id,
+                )
+                .where(models.CardTagRelationship.card_id == models.Card.id)
+                .where(*condition)
+                .exists()
+            )
+
+        if tags_match == "any":
+            return has_tag(models.Tag.name.in_(tag_names))
+        return and_(*[has_tag(models.Tag.name == name) for name in tag_names])
+
+    def _filtered_cards_statement(
+        self,
+        user_id: int | None = None,
+        card_type_id: int | None = None,
+        tags: str | None = None,
+        tags_match: Literal["all", "any"] = "all",
+        limit: int | None = None,
+        after: int | None = None,
+        card_ids: List[int] | None = None,
+    ):
+        """
+        Build select of cards (with eagerly loaded tags) ordered by ID
+        and filtered by user, card type, tags and IDs.
+        Arguments are described in 'get_filtered_cards'
+        and 'iter_filtered_cards'.
+        """
+        statement = (
+            select(models.Card)
+            .options(selectinload(models.Card.tag_list))
+            .order_by(models.Card.id)
+        )
+        if user_id:
+            statement = statement.where(models.Card.user_id == user_id)
+        if card_type_id:
+            statement = statement.where(
+                models.Card.card_type_id == card_type_id
+            )
+        if tags:
+            tag_names = [tag.strip() for tag in tags.split(",") if tag.strip()]
+            if tag_names:
+                statement = statement.where(
+                    self._card_has_tags(tag_names, tags_match)
+                )
+        if card_ids is not None:
+            statement = statement.where(models.Card.id.in_(card_ids))
+        if after:
+            statement = statement.where(models.Card.id > after)
+        if limit:
+            statement = statement.limit(limit)
+        return statement
+
     @session_wrapper
-    async def get_filtered_cards(
+    def get_filtered_cards(
         self,
         session,
         user_id: int | None = None,
         card_type_id: int | None = None,
         tags: str | None = None,
+        tags_match: Literal["all", "any"] = "all",
+        limit: int | None = None,
+        after: int | None = None,
     ) -> List[models.Card | None]:
         """
-        Get cards filtered by user, card type and tags.
+        Get cards filtered by user, card type and tags ordered by ID.
+        Tags of cards are loaded eagerly in one additional query.
 
         Args:
             user_id (int|None, default: None): ID of user
@@ -128,24 +687,277 @@ class CardMakerDatabase:
             card_type_id (int|None, default: None): ID of user
                             (type of card, which should be returned)
             tags: (str|None, default: None): names of tags splitted by '','
+            tags_match (str, default: 'all'):
+                            'all' if card must have all given tags,
+                            'any' if card must have at least one of them
+            limit (int|None, default: None): maximal number of cards
+            after (int|None, default: None): return only cards with ID
+                            greater than this one (keyset pagination cursor)
 
         Returns:
             List[models.Card|None]: list of all cards fullfilling filtering criteria
         """
-        statement = select(models.Card)
-        if user_id:
-            statement = statement.where(models.Card.user_id == user_id)
-        if card_type_id:
-            statement = statement.where(
-                models.Card.card_type_id == card_type_id
-            )
-        if tags:
-            for tag in tags.split(","):
-                statement = statement.where(models.Tag.name == tag)
+        statement = self._filtered_cards_statement(
+            user_id, card_type_id, tags, tags_match, limit, after
+        )
         return session.execute(statement).scalars().all()
 
+    def iter_filtered_cards(
+        self,
+        user_id: int | None = None,
+        card_type_id: int | None = None,
+        tags: str | None = None,
+        tags_match: Literal["all", "any"] = "all",
+        after: int | None = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+        card_ids: List[int] | None = None,
+    ) -> Iterator[models.Card]:
+        """
+        Iterate over filtered cards ordered by ID.
+        Cards are selected in batches by keyset on card ID,
+        so memory usage does not depend on number of matching cards.
+        This is blocking generator, it should be consumed in thread pool
+        (e.g. by 'StreamingResponse').
+
+        Args:
+            batch_size (int, default: STREAM_BATCH_SIZE):
+                            number of cards selected by one query
+            card_ids (List[int]|None, default: None):
+                            return only cards with these IDs
+            other arguments are described in 'get_filtered_cards'
+
+        Yields:
+            models.Card: card with eagerly loaded tags
+        """
+        while True:
+            with Session(self.engine) as session:
+                statement = self._filtered_cards_statement(
+                    user_id,
+                    card_type_id,
+                    tags,
+                    tags_match,
+                    batch_size,
+                    after,
+                    card_ids,
+                )
+                cards = session.execute(statement).scalars().all()
+            yield from cards
+            if len(cards) < batch_size:
+                return
+            after = cards[-1].id
+
+    def iter_cards_for_export(
+        self, batch_size: int = STREAM_BATCH_SIZE
+    ) -> Iterator[tuple]:
+        """
+        Iterate over all cards ordered by ID together with names
+        of their authors and card types.
+        Cards are selected in batches by keyset on card ID,
+        so memory usage does not depend on size of catalogue.
+        This is blocking generator, it should be consumed in thread pool.
+
+        Args:
+            batch_size (int, default: STREAM_BATCH_SIZE):
+                            number of cards selected by one query
+
+        Yields:
+            tuple: card with eagerly loaded tags, user name, card type name
+        """
+        after = 0
+        while True:
+            with Session(self.engine) as session:
+                statement = (
+                    select(
+                        models.Card, models.User.username, models.CardType.name
+                    )
+                    .join(models.User, models.User.id == models.Card.user_id)
+                    .join(
+                        models.CardType,
+                        models.CardType.id == models.Card.card_type_id,
+                    )
+                    .where(models.Card.id > after)
+                    .options(selectinload(models.Card.tag_list))
+                    .order_by(models.Card.id)
+                    .limit(batch_size)
+                )
+                rows = session.exec(statement).all()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0].id
+
+    @session_wrapper
+    def get_card_changes(
+        self, session, since: int = 0, limit: int = 1000
+    ) -> List[models.Card | models.CardTombstone]:
+        """
+        Get cards created, updated or deleted after given revision
+        ordered by revision of change.
+
+        Args:
+            since (int, default: 0): last revision known by client
+            limit (int, default: 1000): maximal number of changes
+
+        Returns:
+            List[models.Card|models.CardTombstone]: changed cards
+                    (with eagerly loaded tags) and tombstones of deleted cards
+        """
+        cards = session.execute(
+            select(models.Card)
+            .options(selectinload(models.Card.tag_list))
+            .where(models.Card.revision > since)
+            .order_by(models.Card.revision)
+            .limit(limit)
+        ).scalars()
+        tombstones = session.execute(
+            select(models.CardTombstone)
+            .where(models.CardTombstone.revision > since)
+            .order_by(models.CardTombstone.revision)
+            .limit(limit)
+        ).scalars()
+        changes = [*cards, *tombstones]
+        return sorted(changes, key=lambda change: change.revision)[:limit]
+
+    def _use_fulltext(self) -> bool:
+        """
+        Check if cards are searched by MySQL FULLTEXT index.
+        """
+        if SEARCH_BACKEND == "auto":
+            return self.engine.dialect.name == "mysql"
+        return SEARCH_BACKEND == "fulltext"
+
+    @staticmethod
+    def _current_revision(session) -> int:
+        """
+        Get revision of last committed change of cards.
+        """
+        counter = models.RevisionCounter
+        value = session.execute(
+            select(counter.value).where(counter.name == "cards")
+        ).scalar_one_or_none()
+        return value or 0
+
+    @session_wrapper
+    def build_search_index(self, session):
+        """
+        Build local 'search_index' from all cards, it is called once
+        at startup, so the first search does not wait for it.
+        Nothing is done if cards are searched by MySQL FULLTEXT index.
+        """
+        if not self._use_fulltext():
+            self._build_search_index(session)
+
+    def _build_search_index(self, session):
+        """
+        Load all cards into 'search_index', cards are read in batches
+        by keyset on ID. The index is built aside and swapped at once,
+        '_search_index_lock' is not held meanwhile, so refreshes
+        (and the database threads running them) do not wait for it.
+        """
+
+        def documents():
+            after = 0
+            while True:
+                rows = session.execute(
+                    select(*SEARCH_COLUMNS)
+                    .where(models.Card.id > after)
+                    .order_by(models.Card.id)
+                    .limit(10 * STREAM_BATCH_SIZE)
+                ).all()
+                for row in rows:
+                    yield row.id, search_fields(row)
+                if len(rows) < 10 * STREAM_BATCH_SIZE:
+                    return
+                after = rows[-1].id
+
+        # Changes after the revision are applied by the next refresh
+        revision = self._current_revision(session)
+        search_index.load(documents(), revision)
+        logger.info("Search index built: %s", search_index.stats())
+
+    def _refresh_search_index(self, session):
+        """
+        Apply changes of cards since revision of 'search_index'
+        (e.g. made by other processes) at most once
+        per 'SEARCH_INDEX_REFRESH' seconds. Index is built
+        if it was not built at startup.
+        """
+        if search_index.refreshed_at is None:
+            self._build_search_index(session)
+            return
+        with _search_index_lock:
+            if (
+                time.monotonic() - search_index.refreshed_at
+                < SEARCH_INDEX_REFRESH
+            ):
+                return
+            since = search_index.revision
+            revision = self._current_revision(session)
+            changed = session.execute(
+                select(*SEARCH_COLUMNS).where(models.Card.revision > since)
+            ).all()
+            removed = session.execute(
+                select(models.CardTombstone.card_id).where(
+                    models.CardTombstone.revision > since
+                )
+            ).scalars()
+            search_index.update(
+                [(row.id, search_fields(row)) for row in changed],
+                removed,
+                revision,
+            )
+
+    @session_wrapper
+    def search_cards(
+        self, session, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[int, List[models.Card]]:
+        """
+        Find cards by words in their name, fluff and effect
+        ordered by relevance. MySQL FULLTEXT index in natural language mode
+        or local 'search_index' is used (see 'SEARCH_BACKEND'),
+        both ignore case and diacritics.
+
+        Args:
+            query (str): searched words
+            limit (int, default: 20): maximal number of cards
+            offset (int, default: 0): number of skipped best cards
+
+        Returns:
+            int: number of all matching cards
+            List[models.Card]: cards with eagerly loaded tags
+        """
+        statement = select(models.Card).options(
+            selectinload(models.Card.tag_list)
+        )
+        if self._use_fulltext():
+            score = match(
+                models.Card.name,
+                models.Card.fluff,
+                models.Card.effect,
+                against=query,
+            ).in_natural_language_mode()
+            total = session.execute(
+                select(func.count()).select_from(models.Card).where(score)
+            ).scalar_one()
+            statement = (
+                statement.where(score)
+                .order_by(score.desc(), models.Card.id)
+                .offset(offset)
+                .limit(limit)
+            )
+            return total, session.execute(statement).scalars().all()
+
+        self._refresh_search_index(session)
+        total, card_ids = search_index.search(query, limit, offset)
+        cards = session.execute(
+            statement.where(models.Card.id.in_(card_ids))
+        ).scalars()
+        cards = {card.id: card for card in cards}
+        return total, [cards[id] for id in card_ids if id in cards]
+
+    @cached("users")
     @session_wrapper
-    async def get_user_by_id_or_default(
+    def get_user_by_id_or_default(
         self,
         session,
         user_id: int | None = None,
@@ -171,8 +983,9 @@ class CardMakerDatabase:
         )
         return session.exec(statement).first()
 
+    @cached("card_types")
     @session_wrapper
-    async def get_card_type_by_id(
+    def get_card_type_by_id(
         self, session, card_type_id: int
     ) -> models.CardType | None:
         """
@@ -192,9 +1005,7 @@ class CardMakerDatabase:
         return session.exec(statement).first()
 
     @session_wrapper
-    async def get_user_by_name(
-        self, session, username: str
-    ) -> models.User | None:
+    def get_user_by_name(self, session, username: str) -> models.User | None:
         """
         Get user of given name if exists.
 
@@ -210,12 +1021,15 @@ class CardMakerDatabase:
         return session.exec(statement).first()
 
     @session_wrapper
-    async def get_card_by_id(self, session, card_id: int) -> models.Card | None:
+    def get_card_by_id(
+        self, session, card_id: int, load_tags: bool = False
+    ) -> models.Card | None:
         """
         Get card of given ID if exists.
 
         Args:
             user_id (int): ID of requested card
+            load_tags (bool, default: False): load tags of card eagerly
 
         Returns:
             model.Card|None:
@@ -223,129 +1037,249 @@ class CardMakerDatabase:
             or None if this ID does not exist
         """
         statement = select(models.Card).where(models.Card.id == card_id)
+        if load_tags:
+            statement = statement.options(selectinload(models.Card.tag_list))
         return session.exec(statement).first()
 
-    @session_wrapper
-    async def get_tags_of_card(self, session, card_id: int) -> List[models.Tag]:
+    def _get_or_create_tags(self, session, tags: List[models.TagBase]) -> dict:
         """
-        Get all tags connected to specific card.
+        Select IDs of tags by their names and save missing tags into database
+        by one multi-row insert in given session, changes are not commited.
 
         Args:
-            card_id (int): ID of card connected to tags
+            tags: (List[models.TagBase]): list of tag instances
 
         Returns:
-            List[models.Tag]: list of tags of card
+            dict: tag IDs by tag names
         """
-        statement = select(models.Card).where(models.Card.id == card_id)
-        return session.exec(statement).first().tag_list
+        tags_by_name = {}
+        for tag in tags:
+            if tag:
+                tags_by_name.setdefault(tag.name, tag)
+        if not tags_by_name:
+            return {}
 
-    @session_wrapper
-    async def get_card_tag_relationship_of_card(
-        self, session, card_id: int
-    ) -> List[models.CardTagRelationship]:
+        def select_tag_ids():
+            statement = select(models.Tag.name, models.Tag.id).where(
+                models.Tag.name.in_(list(tags_by_name))
+            )
+            return dict(session.exec(statement).all())
+
+        tag_ids = select_tag_ids()
+        missing = [name for name in tags_by_name if name not in tag_ids]
+        if missing:
+            session.execute(
+                insert(models.Tag),
+                [
+                    {
+                        "name": name,
+                        "description": tags_by_name[name].description,
+                    }
+                    for name in missing
+                ],
+            )
+            tag_ids = select_tag_ids()
+        return tag_ids
+
+    def _sync_tags_of_card(
+        self, session, tags: List[models.TagBase], card_id: int
+    ):
         """
-        Select from database instance of relationship between card and tag
-        based on card ID.
+        Save tags into database if not exist,
+        create records in relationship table of tags and card if not exist
+        and delete relationships of tags removed from card
+        ('year' tags are never removed).
+        Everything is done by set based statements in given session,
+        changes are not commited.
 
         Args:
-            card_id (int): ID of card
-
-        Returns:
-            List[models.CardTagRelationship]:
-                        list of all relationship of this card
+            tags: (List[models.TagBase]): list of tag instances
+            card_id (int): ID of card, which should be connected with these tags
         """
-        statement = select(models.CardTagRelationship).where(
-            models.CardTagRelationship.card_id == card_id
+        tag_ids = self._get_or_create_tags(session, tags)
+        statement = (
+            select(models.Tag.id, models.Tag.name, models.Tag.description)
+            .join(
+                models.CardTagRelationship,
+                models.CardTagRelationship.tag_id == models.Tag.id,
+            )
+            .where(models.CardTagRelationship.card_id == card_id)
         )
-        return session.exec(statement).all()
+        connected = session.exec(statement).all()
+        removed = [
+            tag_id
+            for tag_id, name, description in connected
+            if name not in tag_ids and description != "year"
+        ]
+        if removed:
+            session.execute(
+                delete(models.CardTagRelationship)
+                .where(models.CardTagRelationship.card_id == card_id)
+                .where(models.CardTagRelationship.tag_id.in_(removed))
+            )
+        added = set(tag_ids.values()) - {tag_id for tag_id, _, _ in connected}
+        if added:
+            session.execute(
+                insert(models.CardTagRelationship),
+                [{"card_id": card_id, "tag_id": tag_id} for tag_id in added],
+            )
 
     @session_wrapper
-    async def _delete_removed_tags_from_card(
+    def save_card_with_tags(
         self,
         session,
-        card_tag_relationship: List[models.CardTagRelationship],
-        card_tags_names: List[str],
-    ):
+        card: models.Card,
+        tags: List[models.TagBase] | None = None,
+    ) -> models.Card:
         """
-        Delete relationship if tag was removed from card
-        or raise IOError.
+        Save new or updated card and connect it with tags
+        in one transaction or raise IOError.
 
         Args:
-            card_tag_relationship: (List[models.CardTagRelationship]):
-                                    list of relationships
-            card_tags_names (List[str]): list of names added to tag
+            card (models.Card): card which should be saved
+            tags: (List[models.TagBase]|None, default: None):
+                        tags of card, relationships are not changed if None
+
+        Returns:
+            models.Card: Same card but updated (with ID)
 
         Raises:
             IOError: if cannot save data into database
         """
-        for i in range(len(card_tag_relationship)):
-            statement = select(models.Tag).where(
-                models.Tag.id == card_tag_relationship[i].tag_id
-            )
-            tag = session.exec(statement).first()
-            if (
-                tag
-                and tag.name not in card_tags_names
-                and tag.description != "year"
-            ):
-                await self.delete_id_db(card_tag_relationship[i])
+        try:
+            self._stamp_cards(session, [card])
+            session.add(card)
+            session.flush()
+            if tags is not None:
+                self._sync_tags_of_card(session, tags, card.id)
+            self._commit(session, "cards", "tags")
+        except Exception as e:
+            session.rollback()
+            raise IOError(f"Database operation failed! {e}")
+        self._refresh(session, card)
+        self._after_commit(
+            session, search_index.add, card.id, search_fields(card)
+        )
+        logger.info("Card %s saved into db.", card.id)
+        return card
 
     @session_wrapper
-    async def _save_added_tags_to_card(
-        self, session, tags: List[models.Tag], card_id: int
-    ):
+    def save_cards_bulk(
+        self, session, cards: List[models.CardCreate]
+    ) -> List[int | str]:
         """
-        Save tag into database if not exists,
-        create new record to relationship table of tag and card if not exist,
+        Save many new cards with their tags in one transaction
         or raise IOError.
+        Users, card types and tags of all cards are resolved
+        by few set based queries, cards and relationships between cards
+        and tags are saved by multi-row inserts of 'BULK_INSERT_BATCH_SIZE'
+        rows. IDs of cards are selected by their consecutive revisions.
+        Cards with invalid user ID or card type ID are skipped.
 
         Args:
-            tags: (List[models.Tag]): list of tag instances
-            card_id (int): ID of card, which should be connected with these tags
+            cards (List[models.CardCreate]): cards to save,
+                            user ID 0 means default user ('Anonym')
+
+        Returns:
+            List[int|str]: for each card ID of created card
+                            or error message if card was skipped
 
         Raises:
             IOError: if cannot save data into database
         """
-        for tag in tags:
-            statement = select(models.Tag).where(models.Tag.name == tag.name)
-            tag_instance = session.exec(statement).first()
-            if not tag_instance:
-                tag_instance = await self.save_into_db(
-                    models.Tag(name=tag.name, description=tag.description)
-                )
-            statement = (
-                select(models.CardTagRelationship)
-                .where(models.CardTagRelationship.card_id == card_id)
-                .where(models.CardTagRelationship.tag_id == tag_instance.id)
+        try:
+            user_ids = set(
+                session.exec(
+                    select(models.User.id).where(
+                        models.User.id.in_({card.user_id for card in cards})
+                    )
+                ).all()
             )
-            if not session.exec(statement).first():
-                await self.save_into_db(
-                    models.CardTagRelationship(
-                        card_id=card_id, tag_id=tag_instance.id
+            default_user = session.exec(
+                select(models.User.id).where(models.User.username == "Anonym")
+            ).first()
+            card_type_ids = set(
+                session.exec(
+                    select(models.CardType.id).where(
+                        models.CardType.id.in_(
+                            {card.card_type_id for card in cards}
+                        )
                     )
-                )
+                ).all()
+            )
 
-    async def connect_tags_with_card(
-        self, tags: List[models.Tag], card_id: int
-    ):
-        """
-        Save tag into database if not exists,
-        create new record to relationship table of tag and card if not exist,
-        and delete relationship if tag was removed from card
-        or raise IOError.
+            if default_user is not None:
+                user_ids.add(default_user)
 
-        Args:
-            tags: (List[models.Tag]): list of tag instances
-            card_id (int): ID of card, which should be connected with these tags
+            # Cards are inserted as rows, data are already validated
+            # by CardCreate, so no Card instances are built
+            results = []
+            new_cards = []
+            for data in cards:
+                user_id = data.user_id or default_user
+                if user_id not in user_ids:
+                    results.append(f"User {data.user_id} not found.")
+                elif data.card_type_id not in card_type_ids:
+                    results.append(f"Card type {data.card_type_id} not found.")
+                else:
+                    row = data.model_dump(exclude={"tags"})
+                    row["user_id"] = user_id
+                    results.append(row)
+                    new_cards.append((row, data))
+            if new_cards:
+                first = self._next_revisions(session, len(new_cards))
+                now = datetime.now()
+                for revision, (row, _) in enumerate(new_cards, first):
+                    row.update(
+                        revision=revision, created_at=now, updated_at=now
+                    )
+                for batch in itertools.batched(
+                    new_cards, BULK_INSERT_BATCH_SIZE
+                ):
+                    session.execute(
+                        insert(models.Card.__table__), [row for row, _ in batch]
+                    )
+                # Revisions of new cards are unique and consecutive
+                ids = dict(
+                    session.execute(
+                        select(models.Card.revision, models.Card.id).where(
+                            models.Card.revision.between(
+                                first, first + len(new_cards) - 1
+                            )
+                        )
+                    ).all()
+                )
+                for row, _ in new_cards:
+                    row["id"] = ids[row["revision"]]
 
-        Raises:
-            IOError: if cannot save data into database
-        """
-        try:
-            await self._delete_removed_tags_from_card(
-                await self.get_card_tag_relationship_of_card(card_id),
-                [tag.name for tag in tags],
+            tag_ids = self._get_or_create_tags(
+                session, [tag for _, data in new_cards for tag in data.tags]
             )
-            await self._save_added_tags_to_card(tags, card_id)
+            links = {
+                (row["id"], tag_ids[tag.name])
+                for row, data in new_cards
+                for tag in data.tags
+                if tag
+            }
+            if links:
+                session.execute(
+                    insert(models.CardTagRelationship),
+                    [
+                        {"card_id": card_id, "tag_id": tag_id}
+                        for card_id, tag_id in links
+                    ],
+                )
+            results = [
+                result["id"] if isinstance(result, dict) else result
+                for result in results
+            ]
+            self._commit(session, "cards", "tags")
         except Exception as e:
-            raise (e)
+            session.rollback()
+            raise IOError(f"Database operation failed! {e}")
+        for row, data in new_cards:
+            self._after_commit(
+                session, search_index.add, row["id"], search_fields(data)
+            )
+        logger.info("%d cards saved into db.", len(new_cards))
+        return results
@@ -1,121 +1,505 @@
 """
 API endpoints.
 """
+import csv
+import io
+import json
 import os
+import zlib
 from datetime import datetime, timedelta
-from typing import Annotated, List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse, Response
-
-from . import models, security, utils
-from .database import CardMakerDatabase
+from itertools import islice
+from typing import Annotated, Iterator, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from pydantic_core import to_json
+from starlette.concurrency import run_in_threadpool
+
+from . import compression, metrics, models, printing, security, utils
+from .utils import ModelJSONResponse
+from .database import (
+    STREAM_BATCH_SIZE,
+    CardMakerDatabase,
+    cache,
+    pool_status,
+    release_connection,
+    search_index,
+)
 from .logger import Logger
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(utils.session_scope)])
 logger = Logger.get_instance()
 database = CardMakerDatabase()
 USE_API_KEY = os.getenv("USE_API_KEY")
+PRINT_MAX_CARDS = int(os.getenv("PRINT_MAX_CARDS", "1000"))
+CARD_FIELDS = list(models.CardGet.model_fields)
+
+
+def card_to_dict(card: models.Card) -> dict:
+    """
+    Convert card with eagerly loaded tags into dictionary
+    with fields of models.CardGet.
+    Data from database are trusted, so no pydantic model is built,
+    the dictionary is serialized directly by 'ModelJSONResponse'.
+
+    Args:
+        card (models.Card): card instance with loaded 'tag_list'
+
+    Returns:
+        dict: card with list of its tags
+    """
+    tags = [
+        {"name": tag.name, "description": tag.description}
+        for tag in card.tag_list
+    ]
+    return {
+        field: tags if field == "tags" else getattr(card, field)
+        for field in CARD_FIELDS
+    }
+
+
+def cards_to_ndjson(cards: Iterator[models.Card]) -> Iterator[bytes]:
+    """
+    Convert cards into lines of newline delimited JSON.
+
+    Args:
+        cards (Iterator[models.Card]): cards with loaded 'tag_list'
+
+    Yields:
+        bytes: one card serialized as JSON line
+    """
+    for card in cards:
+        yield to_json(card_to_dict(card)) + b"\n"
+
+
+def card_to_export_dict(
+    card: models.Card, user_name: str, card_type_name: str
+) -> dict:
+    """
+    Convert card with eagerly loaded tags into dictionary
+    with fields of models.CardExport.
+
+    Args:
+        card (models.Card): card instance with loaded 'tag_list'
+        user_name (str): name of author of card
+        card_type_name (str): name of type of card
+
+    Returns:
+        dict: card with its tags, author and type names
+    """
+    data = card_to_dict(card)
+    data["user_name"] = user_name
+    data["card_type_name"] = card_type_name
+    return data
+
+
+def export_ndjson(rows: Iterator[tuple]) -> Iterator[bytes]:
+    """
+    Serialize exported cards as newline delimited JSON.
+    """
+    for row in rows:
+        yield to_json(card_to_export_dict(*row)) + b"\n"
+
+
+def export_csv(rows: Iterator[tuple]) -> Iterator[str]:
+    """
+    Serialize exported cards as CSV with header,
+    tags are joined by ','.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    fields = list(models.CardExport.model_fields)
+    writer.writerow(fields)
+    for row in rows:
+        card = card_to_export_dict(*row)
+        card["tags"] = ",".join(tag["name"] for tag in card["tags"])
+        writer.writerow([card[field] for field in fields])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_json_gzip(rows: Iterator[tuple]) -> Iterator[bytes]:
+    """
+    Serialize exported cards as gzip compressed JSON array.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    separator = b"["
+    for row in rows:
+        card = to_json(card_to_export_dict(*row))
+        chunk = compressor.compress(separator + card)
+        separator = b","
+        if chunk:
+            yield chunk
+    yield compressor.compress(b"[]" if separator == b"[" else b"]")
+    yield compressor.flush()
+
+
+def card_to_print_dict(card: models.Card, card_type_name: str) -> dict:
+    """
+    Convert card with eagerly loaded tags into dictionary
+    used by 'printing.render_card'.
+
+    Args:
+        card (models.Card): card instance with loaded 'tag_list'
+        card_type_name (str): name of type of card
+
+    Returns:
+        dict: card text fields, size, name of card type and names of tags
+    """
+    return {
+        "id": card.id,
+        "name": card.name,
+        "fluff": card.fluff,
+        "effect": card.effect,
+        "in_set": card.in_set,
+        "set_name": card.set_name,
+        "size": card.size,
+        "card_type_name": card_type_name,
+        "tags": [tag.name for tag in card.tag_list],
+    }
+
+
+EXPORT_FORMATS = {
+    "ndjson": (export_ndjson, "application/x-ndjson", "cards.ndjson"),
+    "csv": (export_csv, "text/csv; charset=utf-8", "cards.csv"),
+    "json.gz": (export_json_gzip, "application/gzip", "cards.json.gz"),
+}
+
+
+@router.get("/status")
+async def get_status():
+    """
+    Get runtime statistics of API, e.g. usage of database connection pool
+    and hits and misses of caches.
+
+    Returns:
+        json response with status code 200: statistics
+    """
+    return ModelJSONResponse(
+        content={
+            "database_pool": pool_status(),
+            "cache": cache.stats(),
+            "token_cache": security.token_cache.stats(),
+            "render_cache": printing.render_cache.stats(),
+            "compressed_cache": compression.compressed_cache.stats(),
+            "search_index": search_index.stats(),
+        },
+        status_code=200,
+    )
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Get metrics of this API process in Prometheus text format:
+    requests and latency histograms by route template and status,
+    requests in flight, SQL statements, usage of database connection pool,
+    hits and misses of caches and size of search index.
+
+    Returns:
+        text response with status code 200: metrics
+    """
+    caches = {
+        "cache": cache,
+        "token_cache": security.token_cache,
+        "compressed_cache": compression.compressed_cache,
+        "render_cache": printing.render_cache,
+    }
+    cache_stats = {name: value.stats() for name, value in caches.items()}
+    pool = {
+        name: value
+        for name, value in pool_status().items()
+        if isinstance(value, int)
+    }
+    lines = metrics.request_metrics.render()
+    lines += metrics.format_metric(
+        "cardmaker_db_pool_connections",
+        "gauge",
+        "Connections of database pool by state.",
+        (("", {"state": state}, value) for state, value in pool.items()),
+    )
+    lines += metrics.format_metric(
+        "cardmaker_cache_hits_total",
+        "counter",
+        "Cache hits by cache.",
+        (("", {"cache": n}, s["hits"]) for n, s in cache_stats.items()),
+    )
+    lines += metrics.format_metric(
+        "cardmaker_cache_misses_total",
+        "counter",
+        "Cache misses by cache.",
+        (("", {"cache": n}, s["misses"]) for n, s in cache_stats.items()),
+    )
+    lines += metrics.format_metric(
+        "cardmaker_cache_hit_ratio",
+        "gauge",
+        "Ratio of hits to all lookups of cache since start.",
+        (
+            ("", {"cache": n}, s["hits"] / max(s["hits"] + s["misses"], 1))
+            for n, s in cache_stats.items()
+        ),
+    )
+    lines += metrics.format_metric(
+        "cardmaker_cache_entries",
+        "gauge",
+        "Entries of cache.",
+        (("", {"cache": n}, s["size"]) for n, s in cache_stats.items()),
+    )
+    lines += metrics.format_metric(
+        "cardmaker_search_index_cards",
+        "gauge",
+        "Cards in local search index.",
+        [("", {}, search_index.stats()["cards"])],
+    )
+    return Response(
+        content="\n".join(lines) + "\n",
+        status_code=200,
+        media_type=metrics.CONTENT_TYPE,
+    )
+
 
 @router.get("/users")
-async def get_users():
+async def get_users(request: Request):
     """
     Get list of all users and their ids.
 
     Returns:
         json response with status code 200: list of all users
+        or response with status code 304 if 'If-None-Match' matches ETag
 
     Raises:
         HTTP 500: database error
     """
-    json_data = jsonable_encoder(
-        await utils.get_or_raise_404(CardMakerDatabase.get_users, database)
+    etag = await utils.make_etag("users")
+    if utils.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    json_data = await utils.get_or_raise_404(
+        CardMakerDatabase.get_users, database
     )
     logger.info("Users requested, response successful.")
-    return JSONResponse(content=json_data, status_code=200)
+    return ModelJSONResponse(
+        content=json_data, status_code=200, headers={"ETag": etag}
+    )
 
 
 @router.get("/card-types")
-async def get_card_types():
+async def get_card_types(request: Request):
     """
     Get list of all card types and their ids.
 
     Returns:
         json response with status code 200: list of all card types
+        or response with status code 304 if 'If-None-Match' matches ETag
 
     Raises:
         HTTP 500: database error
     """
-    json_data = jsonable_encoder(
-        await utils.get_or_raise_404(CardMakerDatabase.get_card_types, database)
+    etag = await utils.make_etag("card_types")
+    if utils.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    json_data = await utils.get_or_raise_404(
+        CardMakerDatabase.get_card_types, database
     )
     logger.info("Card types requested, response successful.")
-    return JSONResponse(content=json_data, status_code=200)
+    return ModelJSONResponse(
+        content=json_data, status_code=200, headers={"ETag": etag}
+    )
 
 
 @router.get("/tags")
-async def get_tags():
+async def get_tags(request: Request):
     """
     Get list of all tags and their ids.
 
     Returns:
         json response with status code 200: list of all tags
+        or response with status code 304 if 'If-None-Match' matches ETag
 
     Raises:
         HTTP 500: database error
     """
-    json_data = jsonable_encoder(
-        await utils.get_or_raise_404(CardMakerDatabase.get_tags, database)
+    etag = await utils.make_etag("tags")
+    if utils.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    json_data = await utils.get_or_raise_404(
+        CardMakerDatabase.get_tags, database
     )
     logger.info("Tags requested, response successful.")
-    return JSONResponse(content=json_data, status_code=200)
+    return ModelJSONResponse(
+        content=json_data, status_code=200, headers={"ETag": etag}
+    )
 
 
 @router.get("/cards")
 async def get_cards(
+    request: Request,
     user_id: int | None = None,
     card_type_id: int | None = None,
     tags: str | None = None,
+    tags_match: Literal["all", "any"] = "all",
+    limit: Annotated[int | None, Query(ge=1)] = None,
+    after: int | None = None,
+    stream: bool = False,
 ):
     """
-    Get list of cards filtered by query parameters.
+    Get list of cards filtered by query parameters ordered by card ID.
 
     Args:
         user_id (int|None, default: None): user ID (model User)
         card_type_id (int|None, default: None): card type ID (model CardType)
         tags (str|None, default: None): tag names splitted by ','
+        tags_match (str, default: 'all'): 'all' returns cards with all tags,
+                                    'any' returns cards with any of tags
+        limit (int|None, default: None): maximal number of returned cards
+        after (int|None, default: None): cursor, return only cards
+                                    with greater ID (value of 'X-Next-Cursor')
+        stream (bool, default: False): stream all matching cards
+                                    as newline delimited JSON
 
     Returns:
-        json response with status code 200: filtered list of cards
+        json response with status code 200: filtered list of cards,
+                header 'X-Next-Cursor' is set if there can be more cards
+        or streamed ndjson response with status code 200 if 'stream' is set
+        or response with status code 304 if 'If-None-Match' matches ETag
 
     Raises:
         HTTP 500: database error
     """
-    cards = await database.get_filtered_cards(
-        user_id=user_id, card_type_id=card_type_id, tags=tags
-    )
+    etag = await utils.make_etag("cards", "tags", key=str(request.query_params))
+    if utils.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    filters = {
+        "user_id": user_id,
+        "card_type_id": card_type_id,
+        "tags": tags,
+        "tags_match": tags_match,
+        "after": after,
+    }
+    if stream:
+        logger.info("Cards stream requested.")
+        return StreamingResponse(
+            cards_to_ndjson(database.iter_filtered_cards(**filters)),
+            media_type="application/x-ndjson",
+            headers={"ETag": etag},
+        )
+    cards = await database.get_filtered_cards(limit=limit, **filters)
     if not cards:
         logger.warning("Invalid resource requested in GET '/cards'")
-    cards_new = []
-    for card in cards:
-        tags = [
-            models.TagBase.model_validate(tag)
-            for tag in await utils.get_or_raise_404(
-                CardMakerDatabase.get_tags_of_card, database, card.id
-            )
-        ]
-        cards_new.append(
-            models.CardGet.model_validate(
-                card.model_dump(), update={"tags": tags}
-            )
-        )
+    cards_new = [card_to_dict(card) for card in cards]
+    headers = {"ETag": etag}
+    if limit and len(cards) == limit:
+        headers["X-Next-Cursor"] = str(cards[-1].id)
     logger.info("Cards requested, response successful.")
-    return JSONResponse(content=jsonable_encoder(cards_new), status_code=200)
+    return ModelJSONResponse(
+        content=cards_new, status_code=200, headers=headers
+    )
+
+
+@router.get("/cards/export")
+async def export_cards(format: Literal["ndjson", "csv", "json.gz"] = "ndjson"):
+    """
+    Stream all cards with their tags, author name and card type name.
+
+    Args:
+        format (str, default: 'ndjson'): 'ndjson', 'csv'
+                                or 'json.gz' (gzip compressed json array)
+
+    Returns:
+        streamed response with status code 200: file with all cards
+
+    Raises:
+        HTTP 500: database error
+    """
+    serialize, media_type, filename = EXPORT_FORMATS[format]
+    logger.info("Cards export in format %s requested.", format)
+    return StreamingResponse(
+        serialize(database.iter_cards_for_export()),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/cards/search")
+async def search_cards(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    offset: Annotated[int, Query(ge=0)] = 0,
+):
+    """
+    Find cards by words in their name, fluff and effect,
+    case and diacritics are ignored.
+
+    Args:
+        q (str): searched words
+        limit (int, default: 20): maximal number of returned cards
+        offset (int, default: 0): number of skipped best matching cards
+
+    Returns:
+        json response with status code 200: list of cards
+                ordered by relevance, header 'X-Total-Count' contains
+                number of all matching cards
+
+    Raises:
+        HTTP 500: database error
+    """
+    total, cards = await database.search_cards(q, limit, offset)
+    logger.info("Cards searched by '%s', %d found.", q, total)
+    return ModelJSONResponse(
+        content=[card_to_dict(card) for card in cards],
+        status_code=200,
+        headers={"X-Total-Count": str(total)},
+    )
+
+
+@router.get("/cards/changes")
+async def get_card_changes(
+    since: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=5000)] = 1000,
+):
+    """
+    Get cards changed after given revision, so clients can keep
+    local copy of cards up to date without downloading all cards.
+
+    Args:
+        since (int, default: 0): 'revision' from previous response,
+                                    0 returns all cards
+        limit (int, default: 1000): maximal number of changes
+
+    Returns:
+        json response with status code 200: 'revision' of last returned
+                change, 'has_more' if there are more changes,
+                created or updated 'cards' and IDs of 'deleted' cards
+
+    Raises:
+        HTTP 500: database error
+    """
+    changes = await database.get_card_changes(since, limit)
+    logger.info(
+        "Card changes since %d requested, %d found.", since, len(changes)
+    )
+    return ModelJSONResponse(
+        content={
+            "revision": changes[-1].revision if changes else since,
+            "has_more": len(changes) == limit,
+            "cards": [
+                card_to_dict(change)
+                for change in changes
+                if isinstance(change, models.Card)
+            ],
+            "deleted": [
+                change.card_id
+                for change in changes
+                if isinstance(change, models.CardTombstone)
+            ],
+        },
+        status_code=200,
+    )
 
 
 @router.get("/cards/{card_id}")
-async def get_card_by_id(card_id: int):
+async def get_card_by_id(request: Request, card_id: int):
     """
     Get card information by card ID.
 
@@ -124,25 +508,21 @@ async def get_card_by_id(card_id: int):
 
     Returns:
         json response with status code 200: card information
+        or response with status code 304 if 'If-None-Match' matches ETag
 
     Raises:
         HTTP 500: database error
     """
+    etag = await utils.make_etag("cards", "tags", key=str(card_id))
+    if utils.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     card = await utils.get_or_raise_404(
-        CardMakerDatabase.get_card_by_id, database, card_id
+        CardMakerDatabase.get_card_by_id, database, card_id, load_tags=True
     )
-    card = models.CardGet.model_validate(
-        card.model_dump(),
-        update={
-            "tags": [
-                models.TagBase.model_validate(tag)
-                for tag in await utils.get_or_raise_404(
-                    CardMakerDatabase.get_tags_of_card, database, card.id
-                )
-            ]
-        },
+    card = card_to_dict(card)
+    return ModelJSONResponse(
+        content=card, status_code=200, headers={"ETag": etag}
     )
-    return JSONResponse(content=jsonable_encoder(card), status_code=200)
 
 
 @router.post("/cards", dependencies=[Depends(security.JWTBearer())])
@@ -169,18 +549,171 @@ async def create_card(data: models.CardCreate):
     await utils.get_or_raise_404(
         CardMakerDatabase.get_card_type_by_id, database, data.card_type_id
     )
-    card = await utils.save_or_raise_500(models.Card.model_validate(data))
     data.tags.append(
         models.Tag(name=str(datetime.now().year), description="year")
     )
-    await utils.connect_tags_or_raise_500(data.tags, card.id)
-    logger.info(f"New card {card.name} created!")
-    return JSONResponse(
+    card = await utils.save_card_or_raise_500(
+        models.Card.model_validate(data), data.tags
+    )
+    logger.info("New card %s created!", card.name)
+    return ModelJSONResponse(
         content={"status": "successfully created", "card_id": card.id},
         status_code=201,
     )
 
 
+@router.post(
+    "/cards/bulk",
+    dependencies=[Depends(security.JWTBearer())],
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/CardCreate"},
+                    }
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def create_cards_bulk(request: Request):
+    """
+    Create many new cards and save them into database in one transaction.
+    Request body is json list of cards or newline delimited json
+    (content type 'application/x-ndjson'), one card per line.
+
+    Args:
+        request (Request): request with cards,
+                fields of cards are defined in models.CardCreate
+
+    Returns:
+        json response with status code 201:
+                result of each card in order of request
+                (ID of created card or error message)
+
+    Raises:
+        HTTP 500: database error
+        HTTP 422: request body is not list of cards
+    """
+    body = await request.body()
+    results = []
+    cards = []
+    try:
+        if request.headers.get("content-type", "").startswith(
+            "application/x-ndjson"
+        ):
+            items = [line for line in body.splitlines() if line.strip()]
+            parse = models.CardCreate.model_validate_json
+        else:
+            items = json.loads(body)
+            parse = models.CardCreate.model_validate
+            if not isinstance(items, list):
+                raise ValueError("List of cards expected.")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid body: {e}")
+    year_tag = models.Tag(name=str(datetime.now().year), description="year")
+    for item in items:
+        try:
+            card = parse(item)
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False)
+            results.append({"status": "invalid", "detail": errors})
+            continue
+        card.tags.append(year_tag)
+        results.append(None)
+        cards.append(card)
+    try:
+        saved = iter(await database.save_cards_bulk(cards) if cards else [])
+    except IOError as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(
+            status_code=500, detail=f"An exception occurred: {e}"
+        )
+    for i, result in enumerate(results):
+        if result is None:
+            card_id = next(saved)
+            results[i] = (
+                {"status": "successfully created", "card_id": card_id}
+                if isinstance(card_id, int)
+                else {"status": "not found", "detail": card_id}
+            )
+    logger.info("%d cards in bulk request processed!", len(cards))
+    return ModelJSONResponse(
+        content={"results": results}, status_code=201
+    )
+
+
+@router.post("/cards/print", dependencies=[Depends(security.JWTBearer())])
+async def print_cards(data: models.CardPrint):
+    """
+    Render cards into print ready PDF with cards laid out on A4 sheets.
+    Cards are selected by their IDs or by filters same as in 'get_cards'.
+
+    Args:
+        data (models.CardPrint): IDs of cards or filters
+                and number of copies of each card
+
+    Returns:
+        streamed response with status code 200: PDF document
+
+    Raises:
+        HTTP 404: no card was found
+        HTTP 413: too many cards ('PRINT_MAX_CARDS')
+        HTTP 500: database error
+    """
+    try:
+        card_types = {
+            card_type.id: card_type.name
+            for card_type in await database.get_card_types()
+        }
+    except IOError as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(
+            status_code=500, detail=f"An exception occurred: {e}"
+        )
+
+    # one card over the limit is enough to reject request,
+    # remaining matching cards are not loaded
+    limit = PRINT_MAX_CARDS // data.copies + 1
+
+    def render():
+        cards = database.iter_filtered_cards(
+            data.user_id,
+            data.card_type_id,
+            data.tags,
+            data.tags_match,
+            batch_size=min(STREAM_BATCH_SIZE, limit),
+            card_ids=data.card_ids,
+        )
+        cards = [
+            card_to_print_dict(card, card_types.get(card.card_type_id, ""))
+            for card in islice(cards, limit)
+        ]
+        if not cards:
+            raise HTTPException(status_code=404, detail="No card found.")
+        if len(cards) * data.copies > PRINT_MAX_CARDS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {PRINT_MAX_CARDS} cards can be printed.",
+            )
+        return len(cards), printing.print_cards(cards, data.copies)
+
+    # Cards are selected by own sessions, connection of request
+    # is not held during rendering
+    await release_connection()
+    count, document = await run_in_threadpool(render)
+    logger.info("%d cards rendered into PDF.", count)
+    return StreamingResponse(
+        printing.iter_file(document),
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'inline; filename="cards.pdf"'},
+    )
+
+
 @router.put("/cards/{card_id}", dependencies=[Depends(security.JWTBearer())])
 async def update_card(card_id: int, data: models.CardUpdate):
     """
@@ -200,10 +733,11 @@ async def update_card(card_id: int, data: models.CardUpdate):
     card = await utils.get_or_raise_404(
         CardMakerDatabase.get_card_by_id, database, card_id
     )
-    if data.tags:
-        await utils.connect_tags_or_raise_500(data.tags, card_id)
-    await utils.save_or_raise_500(card.sqlmodel_update(data.model_dump()))
-    logger.info(f"New card {card.name} updated!")
+    await utils.save_card_or_raise_500(
+        card.sqlmodel_update(data.model_dump()), data.tags or None
+    )
+    printing.invalidate_card(card_id)
+    logger.info("New card %s updated!", card.name)
     return Response(status_code=204)
 
 
@@ -226,7 +760,8 @@ async def delete_card(card_id: int):
         CardMakerDatabase.get_card_by_id, database, card_id
     )
     await utils.delete_or_raise_500(card)
-    logger.info(f"New card {card.name} deleted!")
+    printing.invalidate_card(card_id)
+    logger.info("New card %s deleted!", card.name)
     return Response(status_code=204)
 
 
@@ -247,6 +782,7 @@ async def create_user(data: models.UserCreate):
         HTTP 500: database error
         HTTP 401" wron API key
         HTTP 403: existing username
+        HTTP 503: too many passwords are being hashed
     """
     if USE_API_KEY == "true" and not security.verify_api_key(data.api_key):
             raise HTTPException(status_code=401, detail="Wrong API key!")
@@ -256,8 +792,8 @@ async def create_user(data: models.UserCreate):
             status_code=403,
             detail=f"User with name {data.username} already exists!",
         )
-    logger.info(data)
-    hashed_password, salt = security.hash_password(data.password)
+    logger.info("Creating user %s.", data.username)
+    hashed_password, salt = await security.hash_password_async(data.password)
     user = await utils.save_or_raise_500(
         models.User.model_validate(
             data,
@@ -268,8 +804,8 @@ async def create_user(data: models.UserCreate):
         )
     )
     response = {"status": "success", "user_id": user.id}
-    logger.info(f"New user {user.username} created!")
-    return JSONResponse(content=response, status_code=201)
+    logger.info("New user %s created!", user.username)
+    return ModelJSONResponse(content=response, status_code=201)
 
 
 @router.post("/users/me")
@@ -287,6 +823,7 @@ async def get_access_token(data: models.UserLogin):
 
     Raises:
         HTTP 401: wrong credentials
+        HTTP 503: too many passwords are being hashed
     """
     user = await security.authenticate(
         data.username, data.password
@@ -297,13 +834,11 @@ async def get_access_token(data: models.UserLogin):
             detail="Wrong username or password!",
             headers={"WWW-Authenticate": "Basic"},
         )
-    response = jsonable_encoder(
-        models.Token(
-            access_token=security.create_access_token(
-                user, datetime.now() + timedelta(days=15)
-            ),
-            token_type="bearer",
-            user_id=user.id,
-        )
+    response = models.Token(
+        access_token=security.create_access_token(
+            user, datetime.now() + timedelta(days=15)
+        ),
+        token_type="bearer",
+        user_id=user.id,
     )
-    return JSONResponse(status_code=200, content=response)
+    return ModelJSONResponse(status_code=200, content=response)
@@ -0,0 +1,122 @@
+"""
+Instrumentation of SQL statements, statistics of statements
+of current request and log of slow statements.
+"""
+
+import contextvars
+import os
+import threading
+import time
+
+from sqlalchemy import Engine, event
+
+from .logger import Logger
+
+logger = Logger.get_instance()
+
+# Statements running at least this number of milliseconds
+# are written into slow query log.
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "200"))
+STATEMENT_MAX_LENGTH = 2000
+
+
+class QueryStats:
+    """
+    Number and total duration of SQL statements executed
+    during one request and the slowest of them.
+
+    Args:
+        request (str|None, default: None): method and path of request
+    """
+
+    def __init__(self, request: str | None = None):
+        self.request = request
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = None
+        self.slowest_duration = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, duration: float):
+        """
+        Record executed statement.
+
+        Args:
+            statement (str): SQL statement
+            duration (float): duration of execution in seconds
+        """
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            if duration >= self.slowest_duration:
+                self.slowest = statement
+                self.slowest_duration = duration
+
+
+# Statistics of current request, set by 'log' middleware. Database calls
+# run in thread pool with copied context, so they update the same object.
+query_stats = contextvars.ContextVar("query_stats", default=None)
+
+
+def redact_parameters(parameters):
+    """
+    Replace values of statement parameters, so slow query log
+    does not contain user data (e.g. password hashes).
+
+    Args:
+        parameters: parameters of DBAPI cursor execution
+
+    Returns:
+        parameters with values replaced by '***',
+        number of rows for executemany
+    """
+    if isinstance(parameters, dict):
+        return {key: "***" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"{len(parameters)} rows"
+        return ["***"] * len(parameters)
+    return "***"
+
+
+def _before_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    duration = time.perf_counter() - connection.info["query_start"].pop()
+    stats = query_stats.get()
+    if stats is not None:
+        stats.add(statement, duration)
+    if 1000 * duration >= SLOW_QUERY_THRESHOLD:
+        logger.slow_query(
+            "Slow query (%.1f ms): %s",
+            1000 * duration,
+            statement[:STATEMENT_MAX_LENGTH],
+            parameters=redact_parameters(parameters),
+            duration_ms=round(1000 * duration, 1),
+            request=stats and stats.request,
+        )
+
+
+def _handle_error(context):
+    if context.connection is not None:
+        starts = context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(engine: Engine):
+    """
+    Measure all statements executed by engine.
+
+    Args:
+        engine (Engine): database engine
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -2,9 +2,105 @@
 Script for python logger setup.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 import os
+from datetime import datetime, timezone
+
+# Values of these headers (and extra fields) are never written into log.
+REDACTED_HEADERS = {
+    "authorization",
+    "proxy-authorization",
+    "cookie",
+    "set-cookie",
+    "x-api-key",
+    "x-profile",
+}
+REDACTED = "***"
+
+
+def redact(headers) -> dict:
+    """
+    Convert headers into dictionary without secret values.
+
+    Args:
+        headers (Mapping[str, str]): http headers
+
+    Returns:
+        dict: headers with values of 'REDACTED_HEADERS' replaced
+    """
+    return {
+        name: REDACTED if name.lower() in REDACTED_HEADERS else value
+        for name, value in headers.items()
+    }
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    """
+    Get structured fields passed to Logger methods, headers are redacted.
+
+    Args:
+        record (logging.LogRecord): log record
+
+    Returns:
+        dict: extra fields of record
+    """
+    fields = dict(getattr(record, "fields", {}))
+    if "headers" in fields:
+        fields["headers"] = redact(fields["headers"])
+    return fields
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Format records as JSON lines with time, level, message
+    and extra fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Format records as text lines, extra fields are appended
+    as 'key=value' pairs.
+    """
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = " ".join(
+            f"{key}={value}" for key, value in record_fields(record).items()
+        )
+        return f"{message} {fields}" if fields else message
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler which does not format records,
+    messages are formatted by handlers of listener thread.
+    Arguments of messages must not be changed after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 class Logger(object):
@@ -24,25 +120,57 @@ class Logger(object):
             cls._instance.setup_logger()
         return cls._instance
 
-    def debug(self, message):
-        self.logger.debug(message)
+    def _log(self, level: int, message, args: tuple, fields: dict):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, *args, extra={"fields": fields})
+
+    def debug(self, message, *args, **fields):
+        self._log(logging.DEBUG, message, args, fields)
+
+    def info(self, message, *args, **fields):
+        self._log(logging.INFO, message, args, fields)
+
+    def warning(self, message, *args, **fields):
+        self._log(logging.WARNING, message, args, fields)
+
+    def error(self, message, *args, **fields):
+        self._log(logging.ERROR, message, args, fields)
+
+    def slow_query(self, message, *args, **fields):
+        """
+        Log slow SQL statement into slow query log, it is written
+        regardless of 'LOG_LEVEL'.
+        """
+        self.slow_query_logger.warning(message, *args, extra={"fields": fields})
 
-    def info(self, message):
-        self.logger.info(message)
+    def is_enabled_for(self, level: int) -> bool:
+        """
+        Check if messages of given level are logged,
+        so expensive fields are not computed needlessly.
 
-    def warning(self, message):
-        self.logger.warning(message)
+        Args:
+            level (int): level from module logging
 
-    def error(self, message):
-        self.logger.error(message)
+        Returns:
+            bool: True if messages of level are logged
+        """
+        return self.logger.isEnabledFor(level)
 
     def setup_logger(self):
         """
         Setup for python logger.
-        All messages are logged into file 'cardmaker-api.log' and stdout.
+        All messages are logged into stdout and file 'LOG_FILE' if set.
+        Records are passed through queue and written by listener thread,
+        so logging does not block event loop. Messages are formatted
+        as JSON lines or text depending on 'LOG_FORMAT'.
+        Slow SQL statements are logged into file 'SLOW_QUERY_LOG_FILE'
+        if set, otherwise together with other messages.
         """
         self.logger = logging.getLogger("CardmakerApi")
-        formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+        if os.getenv("LOG_FORMAT", "json").lower() == "text":
+            formatter = TextFormatter()
+        else:
+            formatter = JSONFormatter()
 
         level = os.getenv("LOG_LEVEL")
         if level is not None and level.lower() == "debug":
@@ -52,12 +180,63 @@ class Logger(object):
         else:
             self.logger.setLevel(logging.WARNING)
 
+        handlers = []
         stream_handler = logging.StreamHandler(sys.stdout)
         stream_handler.setFormatter(formatter)
-        self.logger.addHandler(stream_handler)
+        handlers.append(stream_handler)
 
         logfile = os.getenv("LOG_FILE")
         if logfile is not None and logfile != "":
             file_handler = logging.FileHandler(logfile)
             file_handler.setFormatter(formatter)
-            self.logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        slow_query_handlers = handlers
+        slow_query_logfile = os.getenv("SLOW_QUERY_LOG_FILE")
+        if slow_query_logfile:
+            slow_query_handler = logging.FileHandler(slow_query_logfile)
+            slow_query_handler.setFormatter(formatter)
+            slow_query_handlers = [slow_query_handler]
+
+        self.slow_query_logger = logging.getLogger("CardmakerApi.slow_queries")
+        self.slow_query_logger.setLevel(logging.WARNING)
+        self._queues = []
+        self._listeners = []
+        for logger, logger_handlers in (
+            (self.logger, handlers),
+            (self.slow_query_logger, slow_query_handlers),
+        ):
+            queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+            logger.addHandler(queue_handler)
+            logger.propagate = False
+            self._queues.append((queue_handler, logger_handlers))
+        self._start_listeners()
+        atexit.register(self._stop_listeners)
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _start_listeners(self):
+        """
+        Start listener thread of each logger, records are passed to it
+        through new queue.
+        """
+        for queue_handler, handlers in self._queues:
+            queue_handler.queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(
+                queue_handler.queue, *handlers
+            )
+            listener.start()
+            self._listeners.append(listener)
+
+    def _stop_listeners(self):
+        """
+        Write queued records and stop listener threads.
+        """
+        while self._listeners:
+            self._listeners.pop().stop()
+
+    def _restart_after_fork(self):
+        # Listener threads of parent process do not exist in forked worker,
+        # records would stay in queue forever. Records queued by parent
+        # before fork are dropped, parent writes them.
+        self._listeners = []
+        self._start_listeners()
@@ -0,0 +1,179 @@
+"""
+Metrics of API process in Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+from typing import Iterable, List, Tuple
+
+# Upper bounds of buckets of latency histograms in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def format_metric(
+    name: str,
+    kind: str,
+    description: str,
+    samples: Iterable[Tuple[str, dict, float]],
+) -> List[str]:
+    """
+    Format one metric family.
+
+    Args:
+        name (str): name of metric
+        kind (str): 'counter', 'gauge' or 'histogram'
+        description (str): help text
+        samples (Iterable[Tuple[str, dict, float]]): suffix of name
+                (e.g. '_bucket'), labels and value of each sample
+
+    Returns:
+        List[str]: lines of exposition format
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{_labels(labels)} {value}")
+    return lines
+
+
+class RequestMetrics:
+    """
+    Counters and latency histograms of requests by method,
+    route template and status. Observing a request costs a few
+    dictionary operations, histograms are accumulated when rendered.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self._requests = {}
+        self._durations = {}
+        self._database = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        duration: float,
+        statements: int = 0,
+        database_duration: float = 0.0,
+    ):
+        """
+        Record finished request.
+
+        Args:
+            method (str): http method
+            route (str): path template of matched route
+            status (int): status code of response
+            duration (float): duration of request in seconds
+            statements (int, default: 0): number of SQL statements
+            database_duration (float, default: 0.0):
+                    duration of SQL statements in seconds
+        """
+        bucket = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            key = (method, route, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._durations.get((method, route))
+            if histogram is None:
+                histogram = [[0] * (len(self.buckets) + 1), 0.0]
+                self._durations[(method, route)] = histogram
+            histogram[0][bucket] += 1
+            histogram[1] += duration
+            database = self._database.setdefault((method, route), [0, 0.0])
+            database[0] += statements
+            database[1] += database_duration
+
+    def render(self) -> List[str]:
+        """
+        Format metrics of requests.
+
+        Returns:
+            List[str]: lines of exposition format
+        """
+        with self._lock:
+            requests = dict(self._requests)
+            durations = {
+                key: (list(counts), total)
+                for key, (counts, total) in self._durations.items()
+            }
+            database = {
+                key: tuple(value) for key, value in self._database.items()
+            }
+
+        histogram_samples = []
+        for (method, route), (counts, total) in sorted(durations.items()):
+            labels = {"method": method, "route": route}
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                histogram_samples.append(
+                    ("_bucket", {**labels, "le": bound}, cumulative)
+                )
+            histogram_samples.append(("_sum", labels, total))
+            histogram_samples.append(("_count", labels, cumulative))
+
+        return (
+            format_metric(
+                "cardmaker_http_requests_total",
+                "counter",
+                "Finished requests by method, route and status.",
+                (
+                    ("", {"method": m, "route": r, "status": s}, count)
+                    for (m, r, s), count in sorted(requests.items())
+                ),
+            )
+            + format_metric(
+                "cardmaker_http_request_duration_seconds",
+                "histogram",
+                "Duration of requests by method and route.",
+                histogram_samples,
+            )
+            + format_metric(
+                "cardmaker_http_requests_in_flight",
+                "gauge",
+                "Requests being processed.",
+                [("", {}, self.in_flight)],
+            )
+            + format_metric(
+                "cardmaker_db_statements_total",
+                "counter",
+                "SQL statements executed by requests by method and route.",
+                (
+                    ("", {"method": m, "route": r}, statements)
+                    for (m, r), (statements, _) in sorted(database.items())
+                ),
+            )
+            + format_metric(
+                "cardmaker_db_duration_seconds_total",
+                "counter",
+                "Duration of SQL statements of requests by method and route.",
+                (
+                    ("", {"method": m, "route": r}, seconds)
+                    for (m, r), (_, seconds) in sorted(database.items())
+                ),
+            )
+        )
+
+
+request_metrics = RequestMetrics()
@@ -3,8 +3,9 @@ ORM models for 'Cardmaker' database and models for fastapi endpoints.
 """
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -104,6 +105,7 @@ class Tag(TagBase, table=True):
     __tablename__ = "tags"
 
     id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(index=True)
 
     cards: List["Card"] = Relationship(
         back_populates="tag_list", link_model=CardTagRelationship
@@ -140,6 +142,33 @@ class CardGet(CardCreate):
     """
 
     id: int
+    revision: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class CardExport(CardGet):
+    """
+    Card model for 'export_cards' GET method,
+    contains also names of author and card type.
+    """
+
+    user_name: str
+    card_type_name: str
+
+
+class CardPrint(SQLModel):
+    """
+    Model for 'print_cards' POST method, cards are selected by their IDs
+    or by the same filters as in 'get_cards' GET method.
+    """
+
+    card_ids: Optional[List[int]] = None
+    user_id: Optional[int] = None
+    card_type_id: Optional[int] = None
+    tags: Optional[str] = None
+    tags_match: Literal["all", "any"] = "all"
+    copies: int = Field(default=1, ge=1, le=50)
 
 
 class CardUpdate(CardBase):
@@ -156,11 +185,54 @@ class Card(CardBase, table=True):
     """
 
     __tablename__ = "cards"
+    # full-text index is created only in MySQL,
+    # other databases are searched by 'search.InvertedIndex'
+    __table_args__ = (
+        Index(
+            "ix_cards_fulltext",
+            "name",
+            "fluff",
+            "effect",
+            mysql_prefix="FULLTEXT",
+        ).ddl_if(dialect="mysql"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
-    card_type_id: int = Field(foreign_key="card_types.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
+    card_type_id: int = Field(foreign_key="card_types.id", index=True)
+    # revision of last change, see RevisionCounter
+    revision: int = Field(
+        default=0, index=True, sa_column_kwargs={"server_default": "0"}
+    )
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     tag_list: List[Tag] = Relationship(
         back_populates="cards", link_model=CardTagRelationship
     )
+
+
+class RevisionCounter(SQLModel, table=True):
+    """
+    Counter of changes of table, each change of card
+    (create, update or delete) gets next revision of 'cards' counter.
+    """
+
+    __tablename__ = "revision_counters"
+
+    name: str = Field(primary_key=True, max_length=64)
+    value: int = 0
+
+
+class CardTombstone(SQLModel, table=True):
+    """
+    Record of deleted card for incremental synchronization.
+    """
+
+    __tablename__ = "card_tombstones"
+
+    card_id: int = Field(
+        primary_key=True, sa_column_kwargs={"autoincrement": False}
+    )
+    revision: int = Field(index=True)
+    deleted_at: datetime
@@ -0,0 +1,556 @@
+"""
+Server side rendering of cards into vector PDF print sheets.
+"""
+
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import string
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import SpooledTemporaryFile
+from typing import Iterable, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch, mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Frame, KeepInFrame, Paragraph
+from reportlab.platypus.flowables import HRFlowable
+
+from .cache import DiskCache
+from .logger import Logger
+
+logger = Logger.get_instance()
+
+FONTS_DIR = os.getenv(
+    "PRINT_FONTS_DIR",
+    os.path.join(
+        os.path.dirname(__file__), "..", "..", "cardMakerFE", "static", "fonts"
+    ),
+)
+PRINT_PROCESSES = int(os.getenv("PRINT_PROCESSES", str(os.cpu_count() or 1)))
+PRINT_PARALLEL_THRESHOLD = 16
+SHEET_MARGIN = 5 * mm
+CARD_GAP = 1 * mm
+SPOOL_SIZE = 16 * 1024 * 1024
+RENDER_VERSION = 1
+
+# Rendered cards are cached as PDF content streams by hash of their content.
+render_cache = DiskCache(
+    os.getenv(
+        "PRINT_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "cardmaker-print-cache"),
+    ),
+    int(os.getenv("PRINT_CACHE_SIZE", str(64 * 1024 * 1024))),
+)
+# key of last rendered version of each card (by card ID)
+rendered_cards = {}
+
+# Sizes of cards (width, height, border) by card type and card size,
+# same as css classes of cards in frontend.
+CARD_SIZES = {
+    ("Magický předmět", None): (95 * mm, 75 * mm, 2 * mm),
+    ("Volný aspekt", None): (75 * mm, 95 * mm, 2 * mm),
+    ("Lokace", "small"): (290 * mm, 2.2 * inch, 0),
+    ("Lokace", "medium"): (290 * mm, 4 * inch, 0),
+    ("Lokace", "large"): (290 * mm, 7 * inch, 0),
+    ("Zaříkadlo", "small"): (75 * mm, 100 * mm, 2 * mm),
+    ("Zaříkadlo", "large"): (120 * mm, 100 * mm, 2 * mm),
+    ("Recept", "small"): (75 * mm, 100 * mm, 2 * mm),
+    ("Recept", "large"): (120 * mm, 100 * mm, 2 * mm),
+}
+DEFAULT_SIZES = {"Lokace": "medium", "Zaříkadlo": "small", "Recept": "small"}
+
+# Special symbols in card text written by font 'Lingua Prima'.
+LINGUA_PRIMA = {
+    "$uhurus": "A",
+    "$donozoros": "B",
+    "$zalaras": "C",
+    "$miniris": "D",
+    "$tenemenes": "E",
+}
+
+# Characters assigned to font subsets at start of each document,
+# so content stream of card using only these characters
+# is same in every document and can be cached.
+RESERVED_CHARACTERS = (
+    string.printable.strip()
+    + " áčďéěíňóřšťúůýžÁČĎÉĚÍŇÓŘŠŤÚŮÝŽäöüôľĺŕÄÖÜÔĽĹŔ„“‚‘–—…°×·«»§€"
+)
+
+# Names of registered fonts by their purpose,
+# standard PDF fonts are used if bundled fonts are not available.
+FONTS = {
+    "title": "Times-Bold",
+    "text": "Helvetica",
+    "italic": "Helvetica-Oblique",
+    "symbols": "Helvetica",
+}
+_fonts_registered = False
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def register_fonts():
+    """
+    Register fonts bundled with frontend (in 'PRINT_FONTS_DIR')
+    in current process.
+    """
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    _fonts_registered = True
+    fonts = {
+        "title": (
+            "InknutAntiqua-Bold",
+            "Inknut_Antiqua/InknutAntiqua-Bold.ttf",
+        ),
+        "text": ("Montserrat", "Montserrat/Montserrat-Regular.ttf"),
+        "italic": ("Montserrat-Italic", "Montserrat/Montserrat-Italic.ttf"),
+        "bold": ("Montserrat-Bold", "Montserrat/Montserrat-Bold.ttf"),
+        "symbols": ("LinguaPrima", "lingua_prima_2019.ttf"),
+    }
+    try:
+        for name, path in fonts.values():
+            pdfmetrics.registerFont(TTFont(name, os.path.join(FONTS_DIR, path)))
+    except Exception as e:
+        logger.warning("Cannot load fonts from %s: %s", FONTS_DIR, e)
+        return
+    pdfmetrics.registerFontFamily(
+        "Montserrat",
+        normal="Montserrat",
+        italic="Montserrat-Italic",
+        bold="Montserrat-Bold",
+        boldItalic="Montserrat-Bold",
+    )
+    FONTS.update({purpose: name for purpose, (name, _) in fonts.items()})
+
+
+def card_size(card_type_name: str, size: str | None) -> Tuple[float]:
+    """
+    Get size of card in points.
+
+    Args:
+        card_type_name (str): name of card type
+        size (str|None): size of card ('small', 'medium', 'large')
+
+    Returns:
+        Tuple[float]: width, height and border width
+    """
+    if card_type_name not in DEFAULT_SIZES:
+        size = None
+    elif (card_type_name, size) not in CARD_SIZES:
+        size = DEFAULT_SIZES[card_type_name]
+    return CARD_SIZES.get(
+        (card_type_name, size), CARD_SIZES[("Magický předmět", None)]
+    )
+
+
+def _paragraph(text: str | None, style: ParagraphStyle) -> Paragraph:
+    """
+    Create paragraph from card text, special symbols are replaced
+    by 'Lingua Prima' characters. Text which is not valid paragraph markup
+    is escaped.
+    """
+
+    def markup(text):
+        for symbol, character in LINGUA_PRIMA.items():
+            text = text.replace(
+                symbol, f'<font name="{FONTS["symbols"]}">{character}</font>'
+            )
+        return text.replace("\n", "<br/>")
+
+    text = text or ""
+    try:
+        return Paragraph(markup(text), style)
+    except ValueError:
+        return Paragraph(markup(escape(text)), style)
+
+
+def draw_card(pdf: canvas.Canvas, card: dict):
+    """
+    Draw card on canvas with bottom left corner of card at origin.
+
+    Args:
+        pdf (canvas.Canvas): canvas of sheet
+        card (dict): card fields ('name', 'fluff', 'effect', 'in_set',
+                'set_name', 'size'), 'card_type_name' and 'tags' (names)
+    """
+    card_type = card["card_type_name"]
+    width, height, border = card_size(card_type, card["size"])
+    location = card_type == "Lokace"
+    text_size = 12 if location else 10
+
+    header = ParagraphStyle(
+        "header",
+        fontName=FONTS["text"],
+        fontSize=8,
+        leading=10,
+        alignment=TA_CENTER,
+    )
+    title = ParagraphStyle(
+        "title",
+        parent=header,
+        fontName=FONTS["title"],
+        fontSize=60 if location else 10,
+        leading=(60 if location else 10) * 1.7,
+    )
+    text = ParagraphStyle(
+        "text",
+        fontName=FONTS["text"],
+        fontSize=text_size,
+        leading=text_size * 1.25,
+        alignment=TA_JUSTIFY,
+        spaceBefore=5,
+    )
+    fluff = ParagraphStyle("fluff", parent=text, fontName=FONTS["italic"])
+
+    flowables = [_paragraph(card["name"].upper(), title)]
+    if card_type in ("Magický předmět", "Volný aspekt") and card["in_set"]:
+        flowables.append(
+            _paragraph(
+                card["set_name"], ParagraphStyle("set", header, fontSize=6)
+            )
+        )
+    if not location:
+        flowables.append(_paragraph(card_type, header))
+    if card_type == "Magický předmět" and "Neodložitelný" in card["tags"]:
+        flowables.append(_paragraph("Neodložitelný", header))
+    flowables.append(HRFlowable(width="100%", thickness=1.5, color="black"))
+    flowables.append(_paragraph(card["fluff"], fluff))
+    flowables.append(_paragraph(card["effect"], text))
+
+    if border:
+        pdf.setLineWidth(border)
+        pdf.rect(border / 2, border / 2, width - border, height - border)
+    padding = 4 * mm if location else 2
+    frame = Frame(
+        border,
+        border,
+        width - 2 * border,
+        height - 2 * border,
+        leftPadding=padding,
+        rightPadding=padding,
+        topPadding=2,
+        bottomPadding=2,
+    )
+    content = KeepInFrame(
+        width - 2 * border - 2 * padding,
+        height - 2 * border - 4,
+        flowables,
+        mode="shrink",
+    )
+    frame.addFromList([content], pdf)
+
+
+def fragment_key(card: dict) -> str:
+    """
+    Get key of rendered card in 'render_cache',
+    hash of all card content affecting its look.
+
+    Args:
+        card (dict): card described in 'draw_card'
+
+    Returns:
+        str: hex digest
+    """
+    content = [
+        RENDER_VERSION,
+        sorted(FONTS.items()),
+        card["card_type_name"],
+        card["size"],
+        card["name"],
+        card["fluff"],
+        card["effect"],
+        card["in_set"],
+        card["set_name"],
+        sorted(card["tags"]),
+    ]
+    return hashlib.blake2b(
+        json.dumps(content).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _fragments_supported() -> bool:
+    """
+    Check private attributes of reportlab canvas and fonts needed to cache
+    content streams of cards, they are not part of public API
+    and can change in any version of reportlab.
+    """
+    try:
+        pdf = canvas.Canvas(io.BytesIO())
+        pdf._doc.objectcounter, pdf._doc.fontMapping
+        pdf._code, pdf._annotationrefs
+        TTFont.State().nextCode
+    except AttributeError:
+        return False
+    return isinstance(pdf._code, list)
+
+
+# Content streams of cards are cached in 'render_cache' only
+# if installed reportlab has expected internals.
+FRAGMENTS_SUPPORTED = _fragments_supported()
+if not FRAGMENTS_SUPPORTED:
+    logger.warning("Unsupported version of reportlab, cards are not cached.")
+
+
+def _reserve_characters(pdf: canvas.Canvas):
+    """
+    Assign 'RESERVED_CHARACTERS' in all fonts to subsets of new document
+    in fixed order, nothing is drawn.
+    """
+    document = pdf._doc
+    for name in FONTS.values():
+        font = pdfmetrics.getFont(name)
+        if getattr(font, "_dynamicFont", False):
+            for subset, _ in font.splitString(RESERVED_CHARACTERS, document):
+                font.getSubsetInternalName(subset, document)
+        else:
+            document.getInternalFontName(name)
+
+
+def _document_state(pdf: canvas.Canvas) -> tuple:
+    """
+    Get state of document, which changes if drawing adds new objects
+    (e.g. images), fonts or characters to font subsets.
+    """
+    document = pdf._doc
+    return (
+        document.objectcounter,
+        len(document.fontMapping),
+        len(pdf._annotationrefs),
+        tuple(
+            font.state[document].nextCode
+            for font in map(pdfmetrics.getFont, FONTS.values())
+            if getattr(font, "_dynamicFont", False)
+        ),
+    )
+
+
+def _draw_cached(pdf: canvas.Canvas, card: dict, fragment) -> bytes | None:
+    """
+    Draw card into current content stream (of sheet or form),
+    cached fragment is inserted instead if available.
+
+    Returns:
+        bytes|None: new fragment of card, None if cached fragment was used
+                or card cannot be cached
+    """
+    if fragment:
+        pdf._code.append(fragment.decode())
+        return None
+    if not FRAGMENTS_SUPPORTED:
+        draw_card(pdf, card)
+        return None
+    state = _document_state(pdf)
+    start = len(pdf._code)
+    draw_card(pdf, card)
+    if _document_state(pdf) == state:
+        return "\n".join(pdf._code[start:]).encode()
+    return None
+
+
+def render_sheets(
+    sheets: Iterable[Tuple[Tuple[float], list]],
+) -> Tuple[bytes, dict]:
+    """
+    Render sheets with cards into PDF document.
+    Fonts are embedded into document only once.
+    Cards placed more than once are drawn once as form XObject,
+    which is placed for all their copies. Cards with cached fragment
+    are not drawn again, fragment (content stream of card) is inserted
+    into sheet or form.
+
+    Args:
+        sheets (Iterable[Tuple[Tuple[float], list]]): width and height of each
+                sheet and list of cards (described in 'draw_card')
+                with key and cached fragment (or None)
+                and x and y of their bottom left corners
+
+    Returns:
+        bytes: PDF document
+        dict: new fragments of cards by their keys,
+                cards drawing anything else than text of 'RESERVED_CHARACTERS'
+                and lines are not included
+    """
+    register_fonts()
+    sheets = list(sheets)
+    uses = Counter(
+        key for _, placements in sheets for _, key, _, _, _ in placements
+    )
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pageCompression=1)
+    if FRAGMENTS_SUPPORTED:
+        _reserve_characters(pdf)
+    fragments = {}
+    for sheet, placements in sheets:
+        pdf.setPageSize(sheet)
+        for card, key, fragment, x, y in placements:
+            fragment = fragment or fragments.get(key)
+            form = f"card-{key}" if uses[key] > 1 else None
+            if form and not pdf.hasForm(form):
+                width, height, _ = card_size(
+                    card["card_type_name"], card["size"]
+                )
+                pdf.beginForm(form, 0, 0, width, height)
+                fragments[key] = _draw_cached(pdf, card, fragment)
+                pdf.endForm()
+            pdf.saveState()
+            pdf.translate(x, y)
+            if form:
+                pdf.doForm(form)
+            else:
+                fragments[key] = _draw_cached(pdf, card, fragment)
+            pdf.restoreState()
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue(), {
+        key: fragment for key, fragment in fragments.items() if fragment
+    }
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Get process pool for rendering of sheets, create it on first call.
+    Worker processes are spawned, so they do not inherit threads
+    and database connections of API process.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PRINT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def impose(
+    sizes: List[Tuple[float]], copies: int = 1
+) -> List[Tuple[Tuple[float], list]]:
+    """
+    Lay out cards on A4 sheets in rows from top left corner.
+    Cards wider than portrait sheet are laid out on landscape sheets,
+    so one sheet of each orientation is filled at the same time.
+
+    Args:
+        sizes (List[Tuple[float]]): width and height of each card
+        copies (int, default: 1): number of copies of each card
+
+    Returns:
+        List[Tuple[Tuple[float], list]]: width and height of each sheet
+                and index, x and y (bottom left corner) of its cards
+    """
+    sheets = []
+    # open sheet of each orientation: placements, x, top and row height
+    open_sheets = {}
+    for index, (width, height) in enumerate(sizes):
+        landscape = width > A4[0] - 2 * SHEET_MARGIN
+        sheet = (A4[1], A4[0]) if landscape else A4
+        for _ in range(copies):
+            placements, x, top, row = open_sheets.get(
+                landscape, (None, 0, 0, 0)
+            )
+            if placements is not None and x + width > sheet[0] - SHEET_MARGIN:
+                x, top, row = SHEET_MARGIN, top - row - CARD_GAP, 0
+            if placements is None or top - height < SHEET_MARGIN:
+                placements = []
+                sheets.append((sheet, placements))
+                x, top, row = SHEET_MARGIN, sheet[1] - SHEET_MARGIN, 0
+            placements.append((index, x, top - height))
+            open_sheets[landscape] = (
+                placements,
+                x + width + CARD_GAP,
+                top,
+                max(row, height),
+            )
+    return sheets
+
+
+def print_cards(cards: List[dict], copies: int = 1) -> SpooledTemporaryFile:
+    """
+    Lay out cards on A4 sheets and render them into vector PDF.
+    Cards already rendered in 'render_cache' are not rendered again.
+    Large decks are split into chunks of sheets rendered in parallel
+    in process pool and merged into one document.
+    Document is written into temporary file,
+    which is kept in memory only while it is small.
+
+    Args:
+        cards (List[dict]): cards described in 'draw_card' with their 'id'
+        copies (int, default: 1): number of copies of each card
+
+    Returns:
+        SpooledTemporaryFile: PDF document, positioned at start
+    """
+    register_fonts()
+    keys = [fragment_key(card) for card in cards]
+    cached = {
+        key: render_cache.get(key)[1] if FRAGMENTS_SUPPORTED else None
+        for key in set(keys)
+    }
+    for card, key in zip(cards, keys):
+        rendered_cards[card["id"]] = key
+    sizes = [
+        card_size(card["card_type_name"], card["size"])[:2] for card in cards
+    ]
+    sheets = [
+        (
+            sheet,
+            [
+                (cards[index], keys[index], cached[keys[index]], x, y)
+                for index, x, y in placements
+            ],
+        )
+        for sheet, placements in impose(sizes, copies)
+    ]
+    output = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    missing = sum(fragment is None for fragment in cached.values())
+    if PRINT_PROCESSES <= 1 or missing * copies < PRINT_PARALLEL_THRESHOLD:
+        document, fragments = render_sheets(sheets)
+        output.write(document)
+    else:
+        size = -(-len(sheets) // PRINT_PROCESSES)
+        chunks = itertools.batched(sheets, size)
+        writer = PdfWriter()
+        fragments = {}
+        for document, new in get_process_pool().map(render_sheets, chunks):
+            writer.append(PdfReader(io.BytesIO(document)))
+            fragments.update(new)
+        writer.write(output)
+    for key, fragment in fragments.items():
+        render_cache.set(key, fragment)
+    output.seek(0)
+    return output
+
+
+def invalidate_card(card_id: int):
+    """
+    Remove last rendered version of card from 'render_cache'.
+
+    Args:
+        card_id (int): ID of updated or deleted card
+    """
+    key = rendered_cards.pop(card_id, None)
+    if key is not None:
+        render_cache.remove(key)
+
+
+def iter_file(file, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Read file in chunks and close it at the end.
+    """
+    with file:
+        while chunk := file.read(chunk_size):
+            yield chunk
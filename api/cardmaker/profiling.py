@@ -0,0 +1,104 @@
+"""
+Opt-in profiling of single requests by cProfile.
+Request is profiled if its header 'X-Profile' contains 'PROFILE_TOKEN',
+profile is saved in pstats format into 'PROFILE_DIR'.
+"""
+
+import asyncio
+import cProfile
+import os
+import re
+import secrets
+import tempfile
+import threading
+from datetime import datetime
+
+from starlette.requests import Request
+
+from .logger import Logger
+
+logger = Logger.get_instance()
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "cardmaker-profiles")
+)
+PROFILE_HEADER = "x-profile"
+
+# Since Python 3.12 cProfile profiles all threads (including database
+# thread pool) and only one profiler can be active in the process.
+_profiling = threading.Lock()
+
+
+class RequestProfile:
+    """
+    Profile of one request. It contains all code running
+    in the process during the request, so steps of other requests
+    processed at the same time can be present too.
+
+    Args:
+        request (Request): profiled http request
+    """
+
+    def __init__(self, request: Request):
+        self.name = "-".join(
+            [
+                datetime.now().strftime("%Y%m%d-%H%M%S-%f"),
+                request.method,
+                re.sub(r"[^\w.-]+", "_", request.url.path).strip("_"),
+            ]
+        )
+        self.profile = cProfile.Profile()
+
+    def _save(self) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{self.name}.prof")
+        self.profile.dump_stats(path)
+        return path
+
+    async def stop(self) -> str:
+        """
+        Stop profiling and save profile.
+
+        Returns:
+            str: name of saved file in 'PROFILE_DIR'
+        """
+        self.profile.disable()
+        _profiling.release()
+        path = await asyncio.to_thread(self._save)
+        logger.info("Profile of request saved into %s.", path)
+        return os.path.basename(path)
+
+
+def start_profile(request: Request) -> RequestProfile | None:
+    """
+    Start profiling of request if it contains valid 'X-Profile' header
+    and no other request is being profiled.
+    Only a lookup of header is done for other requests.
+
+    Args:
+        request (Request): http request
+
+    Returns:
+        RequestProfile|None: started profile or None
+    """
+    token = request.headers.get(PROFILE_HEADER)
+    if token is None:
+        return None
+    if not PROFILE_TOKEN or not secrets.compare_digest(
+        token.encode(), PROFILE_TOKEN.encode()
+    ):
+        logger.warning("Invalid profiling token.")
+        return None
+    if not _profiling.acquire(blocking=False):
+        logger.warning("Another request is being profiled.")
+        return None
+    profile = RequestProfile(request)
+    try:
+        profile.profile.enable()
+    except ValueError:
+        # Another profiler (e.g. of developer) is active
+        _profiling.release()
+        logger.warning("Another profiler is active.")
+        return None
+    return profile
@@ -0,0 +1,231 @@
+"""
+In-process full-text index of cards used when database
+does not provide full-text search (e.g. SQLite).
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+WORD = re.compile(r"\w+")
+COMBINING = re.compile(r"[\u0300-\u036f]")
+# Most common Czech case and derivational endings (without diacritics),
+# longer endings are tried first.
+SUFFIXES = sorted(
+    (
+        "atech etem atum ami emi imi ymi ech ich ych ach ata aty ama emu "
+        "ymu imu ovi ove ova ou em es im ym um at a e i o u y"
+    ).split(),
+    key=len,
+    reverse=True,
+)
+MIN_STEM = 3
+# Weight of occurrence of word in card field.
+FIELD_WEIGHTS = {"name": 3, "fluff": 1, "effect": 1}
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Remove Czech ending from normalized word, stem keeps at least
+    'MIN_STEM' characters.
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str | None) -> List[str]:
+    """
+    Split text into terms: lowercase words without diacritics
+    and Czech endings. Words shorter than 2 characters are skipped.
+
+    Args:
+        text (str|None): text to split
+
+    Returns:
+        List[str]: terms in order of text
+    """
+    if not text:
+        return []
+    text = COMBINING.sub("", unicodedata.normalize("NFKD", text.casefold()))
+    return [stem(word) for word in WORD.findall(text) if len(word) > 1]
+
+
+class InvertedIndex:
+    """
+    Thread safe inverted index of cards ranked by BM25.
+    Posting list of each term is stored in compact arrays
+    of card IDs and weighted term frequencies.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.revision = 0
+        self.refreshed_at = None
+        self._postings = {}
+        self._documents = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _terms(fields: Dict[str, str | None]) -> Counter:
+        terms = []
+        for field, text in fields.items():
+            terms += tokenize(text) * FIELD_WEIGHTS.get(field, 1)
+        return Counter(terms)
+
+    def _add(self, card_id: int, terms: Counter):
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+            postings[0].append(card_id)
+            postings[1].append(min(frequency, 0xFFFF))
+        length = sum(terms.values())
+        self._documents[card_id] = (tuple(terms), length)
+        self._total_length += length
+
+    def _remove(self, card_id: int):
+        terms, length = self._documents.pop(card_id, ((), 0))
+        self._total_length -= length
+        for term in terms:
+            ids, frequencies = self._postings[term]
+            position = ids.index(card_id)
+            del ids[position]
+            del frequencies[position]
+            if not ids:
+                del self._postings[term]
+
+    def add(self, card_id: int, fields: Dict[str, str | None]):
+        """
+        Add new card into index or replace indexed card.
+
+        Args:
+            card_id (int): ID of card
+            fields (Dict[str, str|None]): indexed text by field name
+        """
+        terms = self._terms(fields)
+        with self._lock:
+            self._remove(card_id)
+            self._add(card_id, terms)
+
+    def remove(self, card_id: int):
+        """
+        Remove card from index if it is indexed.
+
+        Args:
+            card_id (int): ID of card
+        """
+        with self._lock:
+            self._remove(card_id)
+
+    def load(
+        self,
+        documents: Iterable[Tuple[int, Dict[str, str | None]]],
+        revision: int = 0,
+    ):
+        """
+        Replace content of index by given cards.
+        New index is built aside, so searching is not blocked.
+
+        Args:
+            documents (Iterable[Tuple[int, Dict[str, str|None]]]):
+                    ID and indexed text by field name of each card
+            revision (int, default: 0): revision of indexed data
+        """
+        index = InvertedIndex(self.k1, self.b)
+        for card_id, fields in documents:
+            index._add(card_id, self._terms(fields))
+        with self._lock:
+            self._postings = index._postings
+            self._documents = index._documents
+            self._total_length = index._total_length
+            self.revision = revision
+            self.refreshed_at = time.monotonic()
+
+    def update(
+        self,
+        documents: Iterable[Tuple[int, Dict[str, str | None]]],
+        removed: Iterable[int],
+        revision: int,
+    ):
+        """
+        Apply changes of cards into index.
+
+        Args:
+            documents (Iterable[Tuple[int, Dict[str, str|None]]]):
+                    ID and indexed text of created or updated cards
+            removed (Iterable[int]): IDs of deleted cards
+            revision (int): revision of indexed data after changes
+        """
+        for card_id, fields in documents:
+            self.add(card_id, fields)
+        for card_id in removed:
+            self.remove(card_id)
+        with self._lock:
+            self.revision = max(self.revision, revision)
+            self.refreshed_at = time.monotonic()
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[int, List[int]]:
+        """
+        Find cards containing any term of query ordered by relevance.
+
+        Args:
+            query (str): searched text
+            limit (int, default: 20): maximal number of returned IDs
+            offset (int, default: 0): number of skipped best results
+
+        Returns:
+            int: number of all matching cards
+            List[int]: IDs of cards ordered by score (and ID)
+        """
+        scores = {}
+        with self._lock:
+            documents = self._documents
+            if not documents:
+                return 0, []
+            count = len(documents)
+            # BM25 length normalization is 'base + scale * length'
+            base = self.k1 * (1 - self.b)
+            scale = self.k1 * self.b * count / max(self._total_length, 1)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                ids, frequencies = postings
+                idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+                weight = idf * (self.k1 + 1)
+                for card_id, frequency in zip(ids, frequencies):
+                    norm = base + scale * documents[card_id][1]
+                    scores[card_id] = scores.get(card_id, 0) + weight * (
+                        frequency / (frequency + norm)
+                    )
+        best = heapq.nsmallest(
+            offset + limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+        return len(scores), [card_id for card_id, _ in best[offset:]]
+
+    def stats(self) -> dict:
+        """
+        Get size of index.
+
+        Returns:
+            dict: number of indexed cards and terms
+        """
+        with self._lock:
+            return {
+                "cards": len(self._documents),
+                "terms": len(self._postings),
+            }
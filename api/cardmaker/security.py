@@ -2,8 +2,13 @@
 Authorization utilities
 """
 
+import asyncio
+import hashlib
 import os
 import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import Tuple
 
@@ -13,7 +18,13 @@ from fastapi import HTTPException, Request
 from fastapi.security import HTTPBasic, HTTPBearer
 
 from . import models
-from .database import CardMakerDatabase
+from .cache import TTLCache
+from .database import (
+    CardMakerDatabase,
+    detach,
+    get_revisions,
+    release_connection,
+)
 from .logger import Logger
 
 logger = Logger.get_instance()
@@ -23,6 +34,27 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 API_KEY = os.getenv("API_KEY")
 ALGORITHM = "HS256"
 
+# Users of verified tokens, entries expire with token
+# or after TOKEN_CACHE_TTL seconds. Key contains revision of users,
+# so entries are not used after change of users made by this process
+# or observed in revision counters (changes of other processes).
+token_cache = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", "60")),
+)
+
+# Password hashing is slow by design, it runs in dedicated thread pool,
+# so it does not block event loop. When more than PASSWORD_HASH_THREADS
+# + PASSWORD_HASH_QUEUE hashes are pending, new requests are rejected.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_THREADS, thread_name_prefix="cardmaker-bcrypt"
+)
+pending_hashes = 0
+# Slots are released by worker threads when hashing finishes.
+_pending_hashes_lock = threading.Lock()
 
 http_basic = HTTPBasic()
 
@@ -43,12 +75,15 @@ class JWTBearer(HTTPBearer):
                 raise HTTPException(
                     status_code=401, detail="Invalid authentication scheme!"
                 )
+            t0 = time.perf_counter()
             user = await verify_jwt(token)
+            timings = getattr(request.state, "timings", None)
+            if timings is not None:
+                timings["auth"] = time.perf_counter() - t0
             if not user:
                 raise HTTPException(
                     status_code=401, detail="Invalid or expired token!"
                 )
-            logger.debug(token.credentials)
             return token.credentials
         else:
             raise HTTPException(
@@ -71,10 +106,54 @@ def hash_password(password: str, salt: bytes | None = None) -> Tuple[bytes]:
         bytes: salt
     """
     if not salt:
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(str.encode(password), salt), salt
 
 
+async def hash_password_async(
+    password: str, salt: bytes | None = None
+) -> Tuple[bytes]:
+    """
+    Hash password in password thread pool, arguments and return values
+    are described in 'hash_password'. Connection of current request
+    is returned into pool while password is being hashed.
+
+    Raises:
+        HTTP 503: too many passwords are being hashed
+    """
+    global pending_hashes
+    with _pending_hashes_lock:
+        full = pending_hashes >= PASSWORD_HASH_THREADS + PASSWORD_HASH_QUEUE
+        if not full:
+            pending_hashes += 1
+    if full:
+        logger.warning("Password hashing queue is full.")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login attempts, try again later.",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        await release_connection()
+        future = password_executor.submit(hash_password, password, salt)
+    except BaseException:
+        _release_hash_slot()
+        raise
+    # Slot is held until hashing finishes (or queued job is cancelled),
+    # cancelled request does not free it while its hash is computed
+    future.add_done_callback(_release_hash_slot)
+    return await asyncio.wrap_future(future)
+
+
+def _release_hash_slot(future: Future | None = None):
+    """
+    Release slot of password hashing taken by 'hash_password_async'.
+    """
+    global pending_hashes
+    with _pending_hashes_lock:
+        pending_hashes -= 1
+
+
 def verify_api_key(api_key: str) -> bool | None:
     """
     Verify if provided api key is the same as reference api key.
@@ -106,7 +185,7 @@ def create_access_token(user: models.User, expiration: datetime) -> str | None:
     to_encode = user.model_dump()
     to_encode.update({"exp": expiration})
     to_encode.pop("salt")
-    logger.debug(to_encode)
+    logger.debug("Token for user %s created.", user.username)
     if not SECRET_KEY:
         logger.error("Cannot obtain secret key!")
         return
@@ -123,16 +202,19 @@ async def authenticate(username: str, password: str):
 
     Returns:
         models.User|None: db user object
+
+    Raises:
+        HTTP 503: too many passwords are being hashed
     """
     user = await database.get_user_by_name(username)
     if not user:
-        logger.debug(f"{username} not in db")
+        logger.debug("%s not in db", username)
         return
-    hashed_password, _ = hash_password(password, user.salt)
+    hashed_password, _ = await hash_password_async(password, user.salt)
     if not secrets.compare_digest(
         hashed_password, str.encode(user.hashed_password)
     ):
-        logger.debug(f"{hashed_password} is not same as {user.hashed_password}")
+        logger.debug("Wrong password of user %s.", username)
         return
     return user
 
@@ -140,6 +222,9 @@ async def authenticate(username: str, password: str):
 async def verify_jwt(token: str):
     """
     Verify if provided JWT token is correct and returns user object.
+    Verified tokens are cached in 'token_cache' by revision of users
+    known to this process, so cache hit does not touch database.
+    Revision counters are read from database on cache miss.
 
     Args:
         token (str): JWT token
@@ -150,19 +235,31 @@ async def verify_jwt(token: str):
     if not SECRET_KEY:
         logger.error("Cannot obtain secret key!")
         return
+    digest = hashlib.sha256(token.credentials.encode()).hexdigest()
+    hit, user = token_cache.get(("users", get_revisions("users"), digest))
+    if hit:
+        return user
     try:
         payload = jwt.decode(
             token.credentials, SECRET_KEY, algorithms=[ALGORITHM]
         )
-        logger.debug(payload)
         username = payload["username"]
         if not username:
             return
+        # changes of users made by other processes are observed here
+        await database.get_table_revisions("users")
+        key = ("users", get_revisions("users"), digest)
         user = await database.get_user_by_name(username)
-        logger.debug(user)
+        logger.debug("Token of user %s verified.", username)
         if not user:
             return
+    except IOError as e:
+        logger.error("Database error: %s", e)
+        return
     except Exception as e:
-        logger.info(e)
+        logger.info("Invalid token: %s", e)
         return
+    # user is shared by requests, it must not stay in session of this one
+    detach(user)
+    token_cache.set(key, user, ttl=payload["exp"] - time.time())
     return user
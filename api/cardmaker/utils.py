@@ -2,20 +2,116 @@
 Some usefull functions for API endpoints
 """
 
-from typing import Callable
+import hashlib
+from typing import AsyncIterator, Callable, List
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
 from sqlmodel import SQLModel
 
 from . import models
+from .compression import decoded_etag
 from .logger import Logger
-from .database import CardMakerDatabase
+from .database import CardMakerDatabase, UnitOfWork, current_unit
 
 
 logger = Logger.get_instance()
 database = CardMakerDatabase()
 
 
+class ModelJSONResponse(JSONResponse):
+    """
+    JSON response serialized directly into bytes by pydantic-core.
+    Content can contain pydantic (and sqlmodel) models,
+    so 'jsonable_encoder' is not needed.
+    """
+
+    def render(self, content) -> bytes:
+        return to_json(content)
+
+
+async def session_scope() -> AsyncIterator[UnitOfWork]:
+    """
+    FastAPI dependency, all database calls of request share one session
+    (with one identity map and connection) and their changes are committed
+    together when endpoint returns. Changes are rolled back
+    if endpoint raises exception.
+
+    Yields:
+        UnitOfWork: unit of work of request
+
+    Raises:
+        HTTP 500: when cannot commit changes into database
+    """
+    unit = UnitOfWork()
+    token = current_unit.set(unit)
+    try:
+        yield unit
+        await unit.commit()
+    except IOError as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(
+            status_code=500, detail=f"An exception occurred: {e}"
+        )
+    finally:
+        current_unit.reset(token)
+        await unit.close()
+
+
+async def make_etag(*tables: str, key: str = "") -> str:
+    """
+    Create strong ETag from revision counters of tables the response
+    depends on. Counters are shared by all processes of API,
+    so ETag is same in all of them.
+
+    Args:
+        tables (str): names of tables
+        key (str, default: ''): identification of response,
+                e.g. query parameters
+
+    Returns:
+        str: quoted ETag
+
+    Raises:
+        HTTP 500: database error
+    """
+    try:
+        revisions = await database.get_table_revisions(*tables)
+    except IOError as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(
+            status_code=500, detail=f"An exception occurred: {e}"
+        )
+    version = f"{revisions}:{key}"
+    digest = hashlib.blake2b(version.encode(), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """
+    Check if request contains 'If-None-Match' header matching ETag,
+    ETags of compressed representations of resource match too.
+    '*' is not matched, existence of resource is not known
+    before it is loaded.
+
+    Args:
+        request (Request): http request
+        etag (str): current ETag of requested resource
+
+    Returns:
+        bool: True if client has current version of resource
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [
+        decoded_etag(tag.strip().removeprefix("W/"))
+        for tag in header.split(",")
+    ]
+    return etag in candidates
+
+
 async def save_or_raise_500(instance: SQLModel) -> SQLModel:
     """
     Save instance into database or raise HTTP exeption.
@@ -32,27 +128,34 @@ async def save_or_raise_500(instance: SQLModel) -> SQLModel:
     try:
         return await database.save_into_db(instance)
     except IOError as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(
             status_code=500, detail=f"An exception occurred: {e}"
         )
 
 
-async def connect_tags_or_raise_500(tags, card_id):
+async def save_card_or_raise_500(
+    card: models.Card, tags: List[models.TagBase] | None = None
+) -> models.Card:
     """
-    Save new tags and connect existing tags or raise HTTP exeption.
+    Save card and connect it with tags in one transaction
+    or raise HTTP exeption.
 
     Args:
-        tags (List[CreateTag]): list of tags to connect
-        card_id (int): ID of card to connect
+        card (models.Card): card to save
+        tags (List[models.TagBase]|None, default: None):
+                tags of card, relationships are not changed if None
+
+    Returns:
+        models.Card: same card with updated parameters
 
     Raises:
         HTTP 500: when cannot save data into database
     """
     try:
-        await database.connect_tags_with_card(tags, card_id)
+        return await database.save_card_with_tags(card, tags)
     except IOError as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(
             status_code=500, detail=f"An exception occurred: {e}"
         )
@@ -71,7 +174,7 @@ async def delete_or_raise_500(instance: SQLModel):
     try:
         await database.delete_id_db(instance)
     except IOError as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(
             status_code=500, detail=f"An exception occurred: {e}"
         )
@@ -93,7 +196,7 @@ async def get_or_raise_404(
     Raises:
         HTTP 500: when cannot delete data in database
     """
-    logger.debug(args)
+    logger.debug("%s%s requested.", get_function.__name__, args)
     data = await get_function(instance, *args, **kwargs)
     if not data:
         logger.warning("Resource not found.")
@@ -4,15 +4,15 @@ This script will be used just in development.
 """
 
 import json
-import os
 
 from cardmaker import models
+from cardmaker.database import REVISION_COUNTERS, get_engine
 from cardmaker.logger import Logger
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy import func, inspect, text, update
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import Session, SQLModel, select
 
 logger = Logger.get_instance()
-engine = create_engine(os.getenv("DATABASE_URL"))
-logger.info("Engine created")
 
 
 def save_card_types(card_types: list):
@@ -22,7 +22,7 @@ def save_card_types(card_types: list):
     Args:
         card_types (list): list of dictionaries
     """
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         for card_type in card_types:
             card_type_instance = models.CardType(name=card_type["name"])
             try:
@@ -30,11 +30,11 @@ def save_card_types(card_types: list):
             except Exception as e:
                 session.rollback()
                 logger.error(
-                    f"Cannot save card type {card_type["name"]} into db. {e}"
+                    "Cannot save card type %s into db. %s", card_type["name"], e
                 )
                 return
             session.commit()
-            logger.info(f"Card type {card_type["name"]} inserted into db.")
+            logger.info("Card type %s inserted into db.", card_type["name"])
 
 
 def save_tags(tags: list):
@@ -44,7 +44,7 @@ def save_tags(tags: list):
     Args:
         tags (list): list of dictionaries
     """
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         for tag in tags:
             try:
                 session.add(
@@ -52,10 +52,10 @@ def save_tags(tags: list):
                 )
             except Exception as e:
                 session.rollback()
-                logger.error(f"Cannot save tag {tag["name"]} into db. {e}")
+                logger.error("Cannot save tag %s into db. %s", tag["name"], e)
                 return
             session.commit()
-            logger.info(f"Tag {tag["name"]} inserted into db.")
+            logger.info("Tag %s inserted into db.", tag["name"])
 
 
 def json_to_db(json_path: str) -> list:
@@ -77,24 +77,83 @@ def json_to_db(json_path: str) -> list:
 
 def db_initialized():
     try:
-        with Session(engine) as session:
-            statement = select(models.CardType)
-            if session.execute(statement).scalars().all():
-                return True
-            return False
+        with Session(get_engine()) as session:
+            statement = select(models.CardType.id).limit(1)
+            return session.execute(statement).first() is not None
     except Exception as e:
         # if database communucation fails, build it again.
         raise e
 
 
+def upgrade_schema():
+    """
+    Add columns declared in models, which are missing in tables
+    created before the columns were declared. Existing cards get
+    revisions equal to their IDs, so they are returned by first
+    synchronization of changes. Missing revision counters are created.
+    """
+    engine = get_engine()
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            columns = {
+                column["name"] for column in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(
+                    dialect=engine.dialect
+                )
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ADD COLUMN {column_ddl}"
+                    )
+                )
+                logger.info("Column %s.%s added.", table.name, column.name)
+    with Session(engine) as session:
+        if session.get(models.RevisionCounter, "cards") is None:
+            session.execute(
+                update(models.Card)
+                .where(models.Card.revision == 0)
+                .values(revision=models.Card.id)
+            )
+            revision = session.exec(select(func.max(models.Card.revision)))
+            session.add(
+                models.RevisionCounter(name="cards", value=revision.one() or 0)
+            )
+        for name in set(REVISION_COUNTERS.values()) - {"cards"}:
+            if session.get(models.RevisionCounter, name) is None:
+                session.add(models.RevisionCounter(name=name))
+        session.commit()
+
+
+def create_indexes():
+    """
+    Create indexes declared in models, which are missing in tables
+    created before the indexes were declared.
+    """
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(get_engine(), checkfirst=True)
+
+
 def create_db():
     """
     Reinitialize database - drop all tables and create new tables
     This is just for debugging purposes! It will be removed.
     """
     # uncomment if database should be dropped:
-    #SQLModel.metadata.drop_all(engine)
-    SQLModel.metadata.create_all(engine)
-    logger.info(f"Database successfully initialized")
+    #SQLModel.metadata.drop_all(get_engine())
+    SQLModel.metadata.create_all(get_engine())
+    upgrade_schema()
+    create_indexes()
+    logger.info("Database successfully initialized")
     if not db_initialized():
         json_to_db("initial_data.json")
+
+
+if __name__ == "__main__":
+    create_db()
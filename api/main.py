@@ -4,18 +4,47 @@ App for creating summer camp cards and saving them in database.
 
 import uvicorn
 from cardmaker import endpoints
+from cardmaker.database import dispose_engine, executor, get_engine
+from cardmaker.compression import CompressionMiddleware
+from cardmaker.instrumentation import QueryStats, query_stats
+from cardmaker.metrics import request_metrics
+from cardmaker.profiling import start_profile
 from cardmaker.logger import Logger
 from create_db import create_db
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import RequestResponseEndpoint
 from starlette.requests import Request
+import asyncio
+import logging
+import os
+import random
 import time
 from http.client import responses
 
 logger = Logger.get_instance()
+# Fraction of successful requests written into access log.
+ACCESS_LOG_SAMPLE = float(os.getenv("LOG_ACCESS_SAMPLE", "1"))
 
-app = FastAPI(title="api")
+
+def connect():
+    with get_engine().connect():
+        pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engine and its pool are created in each worker at startup,
+    # first connection is opened before the first request
+    await asyncio.get_running_loop().run_in_executor(executor, connect)
+    # Local search index is loaded before the first search needs it
+    await endpoints.database.build_search_index()
+    yield
+    dispose_engine()
+
+
+app = FastAPI(title="api", lifespan=lifespan)
 app.include_router(endpoints.router)
 
 app.add_middleware(
@@ -24,33 +53,95 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=[
+        "ETag",
+        "Server-Timing",
+        "X-DB-Queries",
+        "X-Next-Cursor",
+        "X-Profile-File",
+        "X-Total-Count",
+    ],
 )
+app.add_middleware(CompressionMiddleware)
 
 @app.middleware("http")
 async def log(request: Request, call_next: RequestResponseEndpoint):
-    # Log request details
-    client_ip = request.client.host
-    client_port = request.client.port
-    method = request.method
-    url = request.url
-    headers = request.headers
-
+    request.state.timings = {}
+    stats = QueryStats(f"{request.method} {request.scope['path']}")
+    token = query_stats.set(stats)
     t0 = time.time()
+    request_metrics.in_flight += 1
+    # Profile the request only if asked by admin ('X-Profile' header)
+    profile = start_profile(request)
     # Process the request
-    response = await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        query_stats.reset(token)
+        request_metrics.in_flight -= 1
+        if profile is not None:
+            profile_file = await profile.stop()
+    if profile is not None:
+        response.headers["X-Profile-File"] = profile_file
     t = time.time() - t0
+    # Route template (e.g. '/cards/{card_id}') keeps label cardinality bounded
+    route = request.scope.get("route")
+    request_metrics.observe(
+        request.method,
+        route.path if route is not None else "unmatched",
+        response.status_code,
+        t,
+        stats.count,
+        stats.duration,
+    )
+    request.state.timings["db"] = stats.duration
+    request.state.timings["db-slowest"] = stats.slowest_duration
+    request.state.timings["total"] = t
+    response.headers["X-DB-Queries"] = str(stats.count)
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={1000*duration:.1f}"
+        for name, duration in request.state.timings.items()
+    )
 
-    # Log response details
+    # Log response details, successful requests are sampled,
+    # fields are formatted (and headers redacted) by logging thread
     status_code = response.status_code
-    logger.info(f'REQ: {client_ip}:{client_port} {method} {url} {headers} RES: {status_code} {responses[status_code]} dur={int(1000*t)}ms')
+    if logger.is_enabled_for(logging.INFO) and (
+        status_code >= 400 or random.random() < ACCESS_LOG_SAMPLE
+    ):
+        auth = request.state.timings.get("auth")
+        client = request.client
+        logger.info(
+            "REQ: %s %s RES: %d %s",
+            request.method,
+            request.url.path,
+            status_code,
+            responses[status_code],
+            client=client and f"{client.host}:{client.port}",
+            query=request.url.query,
+            duration_ms=round(1000 * t, 1),
+            auth_ms=auth and round(1000 * auth, 1),
+            db_queries=stats.count,
+            db_ms=round(1000 * stats.duration, 1),
+            db_slowest_ms=round(1000 * stats.slowest_duration, 1),
+            db_slowest=stats.slowest and stats.slowest[:200],
+            headers=request.headers,
+        )
 
     return response
 
 if __name__ == "__main__":
-    create_db()
+    # Schema is checked once before workers are started,
+    # it can be skipped if it is up to date (e.g. 'python create_db.py')
+    if os.getenv("DATABASE_INIT", "true") == "true":
+        create_db()
+        dispose_engine()
+    workers = int(os.getenv("API_WORKERS", "1"))
     uvicorn.run(
-        app,
+        # Workers import the app by themselves
+        "main:app" if workers > 1 else app,
         host="0.0.0.0",
-        port=8003,
+        port=int(os.getenv("API_PORT", "8003")),
+        workers=workers,
         log_config=None,
     )
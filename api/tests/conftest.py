@@ -0,0 +1,122 @@
+"""
+Fixtures of API tests, application uses temporary SQLite database.
+Environment is set before application is imported by test modules.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+# Password of users added by fixture 'add_user'.
+PASSWORD = "password"
+
+DATABASE = os.path.join(tempfile.mkdtemp(prefix="cardmaker-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE}"
+os.environ.setdefault("SECRET_KEY", "cardmaker-tests-secret-key-32-bytes")
+os.environ.setdefault("LOG_LEVEL", "warning")
+
+
+@pytest.fixture
+def engine():
+    """
+    Engine of application with empty tables and caches.
+    """
+    from sqlmodel import SQLModel
+
+    from cardmaker.database import cache, get_engine
+
+    engine = get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    cache.invalidate()
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    """
+    Test client of application.
+    """
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def add_user(engine):
+    """
+    Add user with 'PASSWORD' and card type, usage: add_user("Anonym").
+    """
+    from sqlmodel import Session
+
+    from cardmaker import models
+    from cardmaker.security import hash_password
+
+    def add(username: str):
+        hashed_password, salt = hash_password(PASSWORD)
+        with Session(engine) as session:
+            session.add(
+                models.User(
+                    username=username,
+                    hashed_password=hashed_password.decode(),
+                    salt=salt,
+                )
+            )
+            session.add(models.CardType(name="Postava"))
+            session.commit()
+
+    return add
+
+
+@pytest.fixture
+def authorize(client):
+    """
+    Log user in and return authorization header,
+    usage: authorize("Anonym").
+    """
+
+    def login(username: str) -> dict:
+        response = client.post(
+            "/users/me", json={"username": username, "password": PASSWORD}
+        )
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return login
+
+
+@pytest.fixture
+def headers(add_user, authorize):
+    """
+    Authorization header of added user 'Anonym'.
+    """
+    add_user("Anonym")
+    return authorize("Anonym")
+
+
+@pytest.fixture
+def new_cards():
+    """
+    Create request bodies of cards, usage: new_cards(count, user_id=1,
+    card_type_id=1).
+    """
+
+    def create(count: int, user_id: int = 1, card_type_id: int = 1) -> list:
+        return [
+            {
+                "name": f"card{number}",
+                "fluff": "fluff",
+                "effect": "effect",
+                "in_set": False,
+                "tags": [{"name": f"tag{number % 3}"}],
+                "user_id": user_id,
+                "card_type_id": card_type_id,
+            }
+            for number in range(count)
+        ]
+
+    return create
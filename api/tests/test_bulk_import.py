@@ -0,0 +1,75 @@
+"""
+Bulk import of cards saves cards by multi-row inserts and reports
+invalid users and card types for each card.
+"""
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from cardmaker import models
+
+
+def import_cards(engine, client, headers: dict, cards: list) -> tuple:
+    """
+    Import cards and count SQL statements executed meanwhile.
+
+    Returns:
+        int: number of statements
+        list: results of cards
+    """
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/cards/bulk", json=cards, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 201
+    return len(statements), response.json()["results"]
+
+
+def test_statements_do_not_depend_on_number_of_cards(
+    engine, client, headers, new_cards
+):
+    # first import creates tags
+    import_cards(engine, client, headers, new_cards(3))
+    one, results = import_cards(engine, client, headers, new_cards(1))
+    fifty, results = import_cards(engine, client, headers, new_cards(50))
+    assert one == fifty
+    assert [result["card_id"] for result in results] == list(range(5, 55))
+    with Session(engine) as session:
+        card = session.get(models.Card, 54)
+        assert card.name == "card49"
+        assert sorted(tag.name for tag in card.tag_list) == sorted(
+            ["tag1", str(card.created_at.year)]
+        )
+        revisions = session.exec(select(models.Card.revision)).all()
+        assert len(set(revisions)) == 54
+
+
+def test_invalid_cards_are_reported(engine, client, headers, new_cards):
+    cards = new_cards(2) + new_cards(1, user_id=7) + new_cards(1, 0, 9)
+    _, results = import_cards(engine, client, headers, cards)
+    assert [result["status"] for result in results] == [
+        "successfully created",
+        "successfully created",
+        "not found",
+        "not found",
+    ]
+    assert results[2]["detail"] == "User 7 not found."
+    assert results[3]["detail"] == "Card type 9 not found."
+
+
+def test_default_user_is_missing(
+    engine, client, add_user, authorize, new_cards
+):
+    add_user("Autor")
+    headers = authorize("Autor")
+    _, results = import_cards(
+        engine, client, headers, new_cards(1) + new_cards(1, user_id=0)
+    )
+    assert results[0] == {"status": "successfully created", "card_id": 1}
+    assert results[1] == {"status": "not found", "detail": "User 0 not found."}
@@ -0,0 +1,36 @@
+"""
+Results of database methods are cached, missing rows are not.
+Size of disk cache is tracked when entries are replaced.
+"""
+
+import asyncio
+
+from sqlmodel import Session
+
+from cardmaker import models
+from cardmaker.cache import DiskCache
+from cardmaker.database import CardMakerDatabase
+
+
+def test_missing_row_is_not_cached(engine):
+    database = CardMakerDatabase()
+    assert asyncio.run(database.get_card_type_by_id(1)) is None
+    # row created by other process, counters of this process do not change
+    with Session(engine) as session:
+        session.add(models.CardType(name="Postava"))
+        session.commit()
+    card_type = asyncio.run(database.get_card_type_by_id(1))
+    assert card_type.name == "Postava"
+    assert asyncio.run(database.get_card_type_by_id(1)) is card_type
+
+
+def test_replaced_entry_is_counted_once(tmp_path):
+    cache = DiskCache(str(tmp_path), maxbytes=100)
+    cache.set("old", b"o" * 40)
+    for _ in range(5):
+        cache.set("key", b"k" * 40)
+    assert cache._size == 80
+    assert cache.get("old") == (True, b"o" * 40)
+    cache.set("key", b"k" * 10)
+    assert cache._size == 50
+    assert cache.stats()["bytes"] == 50
@@ -0,0 +1,58 @@
+"""
+Changes feed returns cards changed after revision cursor in order
+of revisions and IDs of deleted cards.
+"""
+
+
+def test_changes_since_revision(client, headers, new_cards):
+    ids = []
+    for data in new_cards(3):
+        response = client.post("/cards", json=data, headers=headers)
+        assert response.status_code == 201
+        ids.append(response.json()["card_id"])
+    first, second, third = ids
+
+    data = new_cards(1)[0]
+    data["name"] = "renamed"
+    del data["user_id"], data["card_type_id"]
+    response = client.put(f"/cards/{first}", json=data, headers=headers)
+    assert response.status_code == 204
+    response = client.delete(f"/cards/{second}", headers=headers)
+    assert response.status_code == 204
+
+    changes = client.get("/cards/changes").json()
+    assert [card["id"] for card in changes["cards"]] == [third, first]
+    assert changes["cards"][1]["name"] == "renamed"
+    assert changes["deleted"] == [second]
+    assert not changes["has_more"]
+    revisions = [card["revision"] for card in changes["cards"]]
+    assert revisions == sorted(revisions)
+    assert changes["revision"] > revisions[-1]
+
+    page = client.get("/cards/changes", params={"limit": 2}).json()
+    assert page["has_more"]
+    assert [card["id"] for card in page["cards"]] == [third, first]
+    assert page["deleted"] == []
+    assert page["revision"] == revisions[-1]
+    page = client.get(
+        "/cards/changes", params={"since": page["revision"]}
+    ).json()
+    assert page == {
+        "revision": changes["revision"],
+        "has_more": False,
+        "cards": [],
+        "deleted": [second],
+    }
+
+    since = changes["revision"]
+    assert client.get("/cards/changes", params={"since": since}).json() == {
+        "revision": since,
+        "has_more": False,
+        "cards": [],
+        "deleted": [],
+    }
+    response = client.put(f"/cards/{third}", json=data, headers=headers)
+    assert response.status_code == 204
+    changes = client.get("/cards/changes", params={"since": since}).json()
+    assert [card["id"] for card in changes["cards"]] == [third]
+    assert changes["revision"] > since
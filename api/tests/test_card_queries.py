@@ -0,0 +1,186 @@
+"""
+Queries of cards: number of SQL statements of 'GET /cards' does not depend
+on number of returned cards (tags are loaded eagerly), ETags and filters.
+"""
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from cardmaker import models
+
+TAGS_PER_CARD = 3
+
+
+def seed_cards(engine, count: int):
+    """
+    Add user, card type, tags and 'count' cards with 'TAGS_PER_CARD' tags.
+    """
+    with Session(engine) as session:
+        user = session.get(models.User, 1)
+        if user is None:
+            user = models.User(username="Anonym", hashed_password="", salt=b"")
+            session.add(user)
+            session.add(models.CardType(name="Postava"))
+            session.add_all(
+                models.Tag(name=f"tag{number}", description="")
+                for number in range(TAGS_PER_CARD)
+            )
+            session.flush()
+        tags = session.exec(select(models.Tag)).all()
+        for number in range(count):
+            session.add(
+                models.Card(
+                    name=f"card{number}",
+                    fluff="fluff",
+                    effect="effect",
+                    in_set=False,
+                    user_id=user.id,
+                    card_type_id=1,
+                    tag_list=tags,
+                )
+            )
+        session.commit()
+
+
+def count_statements(engine, client, url: str) -> tuple:
+    """
+    Request url and count SQL statements executed meanwhile.
+
+    Returns:
+        int: number of statements
+        httpx.Response: response
+    """
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return len(statements), response
+
+
+def test_statements_do_not_depend_on_number_of_cards(engine, client):
+    seed_cards(engine, 1)
+    one, response = count_statements(engine, client, "/cards")
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+    seed_cards(engine, 49)
+    fifty, response = count_statements(engine, client, "/cards")
+    assert response.status_code == 200
+    cards = response.json()
+    assert len(cards) == 50
+    assert all(len(card["tags"]) == TAGS_PER_CARD for card in cards)
+    assert one == fifty
+
+
+def test_response_shape(engine, client):
+    seed_cards(engine, 1)
+    (card,) = client.get("/cards").json()
+    assert set(card) == set(models.CardGet.model_fields)
+    models.CardGet.model_validate(card)
+    assert card["tags"] == [
+        {"name": f"tag{number}", "description": ""}
+        for number in range(TAGS_PER_CARD)
+    ]
+
+
+def test_etag_changes_after_writes(client, headers, new_cards):
+    response = client.post("/cards", json=new_cards(1)[0], headers=headers)
+    assert response.status_code == 201
+    card_id = response.json()["card_id"]
+    urls = ["/cards", f"/cards/{card_id}"]
+    # encoded ETags are tested in test_compression
+    plain = {"Accept-Encoding": "identity"}
+
+    def etags() -> list:
+        tags = []
+        for url in urls:
+            response = client.get(url, headers=plain)
+            assert response.status_code == 200
+            tags.append(response.headers["etag"])
+            response = client.get(
+                url, headers={**plain, "If-None-Match": tags[-1]}
+            )
+            assert response.status_code == 304
+            assert response.headers["etag"] == tags[-1]
+        return tags
+
+    created = etags()
+    response = client.post("/cards", json=new_cards(1)[0], headers=headers)
+    assert response.status_code == 201
+    other = etags()
+    assert other[0] != created[0]
+
+    data = new_cards(1)[0]
+    data["name"] = "renamed"
+    del data["user_id"], data["card_type_id"]
+    response = client.put(f"/cards/{card_id}", json=data, headers=headers)
+    assert response.status_code == 204
+    updated = etags()
+    assert updated[0] != other[0]
+    assert updated[1] != other[1]
+
+    response = client.delete(f"/cards/{card_id}", headers=headers)
+    assert response.status_code == 204
+    response = client.get("/cards", headers={"If-None-Match": updated[0]})
+    assert response.status_code == 200
+    assert response.headers["etag"] != updated[0]
+    response = client.get(urls[1], headers={"If-None-Match": updated[1]})
+    assert response.status_code == 404
+
+
+def test_wildcard_does_not_match_missing_card(engine, client):
+    response = client.get("/cards/999", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+
+def test_filter_by_tags(engine, client):
+    with Session(engine) as session:
+        session.add(
+            models.User(username="Anonym", hashed_password="", salt=b"")
+        )
+        session.add(models.CardType(name="Postava"))
+        red, blue, green = (
+            models.Tag(name=name) for name in ("red", "blue", "green")
+        )
+        # second tag of the same name, card 'both' matches 'red' twice
+        red_again = models.Tag(name="red")
+        cards = {
+            "red": [red],
+            "blue": [blue],
+            "both": [red, red_again, blue],
+            "green": [green],
+        }
+        for name, tags in cards.items():
+            session.add(
+                models.Card(
+                    name=name,
+                    fluff="",
+                    effect="",
+                    in_set=False,
+                    user_id=1,
+                    card_type_id=1,
+                    tag_list=tags,
+                )
+            )
+        session.commit()
+
+    def names(tags: str, tags_match: str = "all") -> list:
+        response = client.get(
+            "/cards", params={"tags": tags, "tags_match": tags_match}
+        )
+        assert response.status_code == 200
+        return [card["name"] for card in response.json()]
+
+    assert names("red") == ["red", "both"]
+    assert names("red,blue") == ["both"]
+    assert names("red,red") == ["red", "both"]
+    assert names("red,green") == []
+    assert names("red,blue", "any") == ["red", "blue", "both"]
+    assert names("red,green", "any") == ["red", "both", "green"]
+    assert names("missing", "any") == []
@@ -0,0 +1,41 @@
+"""
+Compressed and identity representations have different ETags,
+304 response carries ETag of representation client validates.
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "encoding, suffix", [("br", "-br"), ("gzip", "-gzip"), ("identity", "")]
+)
+def test_not_modified_keeps_etag_of_representation(
+    client, headers, new_cards, encoding, suffix
+):
+    response = client.post("/cards/bulk", json=new_cards(10), headers=headers)
+    assert response.status_code == 201
+    accept = {"Accept-Encoding": encoding}
+
+    response = client.get("/cards", headers=accept)
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding", "identity") == encoding
+    etag = response.headers["etag"]
+    assert etag.endswith(f'{suffix}"')
+
+    response = client.get("/cards", headers={**accept, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_small_response_keeps_identity_etag(client, headers, new_cards):
+    response = client.post("/cards", json=new_cards(1)[0], headers=headers)
+    url = f"/cards/{response.json()['card_id']}"
+    accept = {"Accept-Encoding": "br"}
+
+    response = client.get(url, headers=accept)
+    assert "content-encoding" not in response.headers
+    etag = response.headers["etag"]
+
+    response = client.get(url, headers={**accept, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
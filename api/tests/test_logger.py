@@ -0,0 +1,44 @@
+"""
+Records logged in forked worker are written by its own listener thread.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+SCRIPT = textwrap.dedent("""
+    import os
+    from cardmaker.logger import Logger
+
+    logger = Logger.get_instance()
+    logger.warning("parent before fork")
+    pid = os.fork()
+    if pid == 0:
+        logger.warning("forked worker")
+    else:
+        os.waitpid(pid, 0)
+        logger.warning("parent after fork")
+    """)
+
+
+def test_forked_worker_writes_records(tmp_path):
+    logfile = tmp_path / "api.log"
+    subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        check=True,
+        capture_output=True,
+        timeout=60,
+        cwd=os.path.dirname(os.path.dirname(__file__)),
+        env={"LOG_FILE": str(logfile), "LOG_FORMAT": "text"},
+    )
+    messages = [
+        line.split(" ", 3)[-1]
+        for line in logfile.read_text().split("\n")
+        if line
+    ]
+    assert sorted(messages) == [
+        "forked worker",
+        "parent after fork",
+        "parent before fork",
+    ]
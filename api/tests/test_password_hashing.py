@@ -0,0 +1,55 @@
+"""
+Slot of password hashing is held until hash is computed,
+even if request waiting for it is cancelled.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from cardmaker import security
+
+
+def test_cancelled_request_holds_slot(monkeypatch):
+    started = threading.Event()
+    finish = threading.Event()
+    hashed = threading.Event()
+
+    def hash_password(password, salt=None):
+        started.set()
+        finish.wait(5)
+        hashed.set()
+        return b"hash", b"salt"
+
+    monkeypatch.setattr(security, "hash_password", hash_password)
+    monkeypatch.setattr(security, "PASSWORD_HASH_THREADS", 1)
+    monkeypatch.setattr(security, "PASSWORD_HASH_QUEUE", 0)
+
+    async def cancel_and_retry():
+        task = asyncio.create_task(security.hash_password_async("password"))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert security.pending_hashes == 1
+        with pytest.raises(HTTPException) as error:
+            await security.hash_password_async("password")
+        assert error.value.status_code == 503
+        finish.set()
+        await asyncio.to_thread(hashed.wait, 5)
+
+    asyncio.run(cancel_and_retry())
+    # slot is released by worker thread after hash_password returns
+    for _ in range(100):
+        if security.pending_hashes == 0:
+            break
+        time.sleep(0.01)
+    assert security.pending_hashes == 0
+    assert asyncio.run(security.hash_password_async("password")) == (
+        b"hash",
+        b"salt",
+    )
+    assert security.pending_hashes == 0
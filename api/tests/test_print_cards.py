@@ -0,0 +1,25 @@
+"""
+Printing loads at most one card over 'PRINT_MAX_CARDS' before request
+is rejected.
+"""
+
+from cardmaker import endpoints
+
+
+def test_too_many_cards_are_not_loaded(client, headers, new_cards, monkeypatch):
+    response = client.post("/cards/bulk", json=new_cards(60), headers=headers)
+    assert response.status_code == 201
+
+    loaded = []
+    iter_filtered_cards = endpoints.database.iter_filtered_cards
+
+    def record(*args, **kwargs):
+        for card in iter_filtered_cards(*args, **kwargs):
+            loaded.append(card.id)
+            yield card
+
+    monkeypatch.setattr(endpoints, "PRINT_MAX_CARDS", 20)
+    monkeypatch.setattr(endpoints.database, "iter_filtered_cards", record)
+    response = client.post("/cards/print", json={"copies": 2}, headers=headers)
+    assert response.status_code == 413
+    assert loaded == list(range(1, 12))
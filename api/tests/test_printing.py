@@ -0,0 +1,64 @@
+"""
+Rendering of cards into PDF with and without cached fragments.
+"""
+
+import io
+
+from pypdf import PdfReader
+
+from cardmaker import printing
+
+CARD = {
+    "id": 1,
+    "name": "Meč",
+    "fluff": "Příliš žluťoučký kůň.",
+    "effect": "Úpěl ďábelské ódy $uhurus.",
+    "in_set": False,
+    "set_name": None,
+    "size": None,
+    "card_type_name": "Magický předmět",
+    "tags": [],
+}
+
+
+def render(copies: int, fragment: bytes | None = None) -> tuple:
+    """
+    Render 'copies' of card on one sheet.
+
+    Returns:
+        PdfReader: rendered document
+        dict: new fragments
+    """
+    placements = [
+        (CARD, "key", fragment, 10 + 100 * copy, 10) for copy in range(copies)
+    ]
+    document, fragments = printing.render_sheets([(printing.A4, placements)])
+    return PdfReader(io.BytesIO(document)), fragments
+
+
+def test_installed_reportlab_supports_fragments():
+    assert printing.FRAGMENTS_SUPPORTED
+
+
+def test_cached_fragment_is_rendered():
+    document, fragments = render(1)
+    text = document.pages[0].extract_text()
+    assert "MEČ" in text
+    cached, new = render(1, fragments["key"])
+    assert new == {}
+    assert cached.pages[0].extract_text() == text
+
+
+def test_copies_are_drawn_once_as_form():
+    document, fragments = render(3)
+    resources = document.pages[0]["/Resources"]
+    assert len(resources["/XObject"]) == 1
+    assert list(fragments) == ["key"]
+    assert document.pages[0].extract_text().count("MEČ") == 3
+
+
+def test_cards_are_rendered_without_fragments(monkeypatch):
+    monkeypatch.setattr(printing, "FRAGMENTS_SUPPORTED", False)
+    document, fragments = render(2)
+    assert fragments == {}
+    assert document.pages[0].extract_text().count("MEČ") == 2
@@ -0,0 +1,78 @@
+"""
+Local full-text index: terms without case, diacritics and Czech endings
+and ranking of cards by BM25.
+"""
+
+from cardmaker import search
+
+
+def test_tokenize_strips_case_and_diacritics():
+    assert search.tokenize("Příliš ŽLUŤOUČKÝ kůň") == [
+        "prilis",
+        "zlutouck",
+        "kun",
+    ]
+    assert search.tokenize("Meč") == search.tokenize("meč") == ["mec"]
+    assert search.tokenize(None) == search.tokenize("") == []
+
+
+def test_tokenize_skips_short_words():
+    assert search.tokenize("a i meč") == ["mec"]
+
+
+def test_stem_removes_endings():
+    assert search.tokenize("kouzlo kouzla kouzlům kouzlech") == ["kouzl"] * 4
+    assert search.tokenize("meče mečem meči") == ["mec"] * 3
+    # stem keeps at least 'MIN_STEM' characters
+    assert search.stem("ova") == "ova"
+    assert search.stem("draka") == "drak"
+
+
+def test_search_ranks_cards():
+    index = search.InvertedIndex()
+    index.load(
+        [
+            (1, {"name": "Štít", "fluff": "Kouzelný meč", "effect": None}),
+            (2, {"name": "Meč", "fluff": None, "effect": "Zraní draka."}),
+            (3, {"name": "Lektvar", "fluff": "Léčí", "effect": "Léčí"}),
+            (4, {"name": "Drak", "fluff": "Meče drakům nevadí.", "effect": ""}),
+        ],
+        revision=7,
+    )
+    assert index.revision == 7
+    assert index.stats() == {"cards": 4, "terms": 8}
+    # occurrence in name is weighted more than in fluff
+    assert index.search("meč") == (3, [2, 1, 4])
+    # card matching more terms is the best
+    assert index.search("MEČE draka") == (3, [4, 2, 1])
+    assert index.search("meč", limit=1, offset=1) == (3, [1])
+    assert index.search("jablko") == (0, [])
+
+
+def test_search_index_changes():
+    index = search.InvertedIndex()
+    index.add(1, {"name": "Meč"})
+    index.add(2, {"name": "Drak"})
+    index.add(1, {"name": "Štít"})
+    assert index.search("meč") == (0, [])
+    assert index.search("štít") == (1, [1])
+    index.update([(3, {"name": "Meč"})], [2], revision=3)
+    assert index.search("meč drak") == (1, [3])
+    assert index.stats() == {"cards": 2, "terms": 2}
+    assert index.revision == 3
+
+
+def test_index_is_built_at_startup(client, headers, new_cards):
+    from cardmaker.database import search_index
+
+    assert search_index.refreshed_at is not None
+    assert search_index.stats() == {"cards": 0, "terms": 0}
+    data = new_cards(2)
+    data[1]["name"] = "Kouzelný meč"
+    for card in data:
+        response = client.post("/cards", json=card, headers=headers)
+        assert response.status_code == 201
+    response = client.get("/cards/search", params={"q": "meče"})
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "1"
+    assert [card["name"] for card in response.json()] == ["Kouzelný meč"]
@@ -0,0 +1,82 @@
+"""
+Verified tokens are cached, cache hit does not touch database.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
+from sqlmodel import Session
+
+from cardmaker import models, security
+from cardmaker.database import UnitOfWork, current_unit, touch
+
+
+async def verify_in_unit(credentials) -> tuple:
+    """
+    Verify token in unit of work as request does.
+
+    Returns:
+        models.User|None: user of token
+        Session|None: session of user while unit of work was open
+    """
+    unit = UnitOfWork()
+    token = current_unit.set(unit)
+    try:
+        user = await security.verify_jwt(credentials)
+        return user, user and inspect(user).session
+    finally:
+        current_unit.reset(token)
+        await unit.close()
+
+
+def verify(engine, credentials) -> tuple:
+    """
+    Verify token and count SQL statements executed meanwhile.
+
+    Returns:
+        int: number of statements
+        models.User|None: user of token
+        Session|None: session of user while unit of work was open
+    """
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        user, session = asyncio.run(verify_in_unit(credentials))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return len(statements), user, session
+
+
+def test_cached_token_does_not_touch_database(engine):
+    with Session(engine) as session:
+        user = models.User(username="Anonym", hashed_password="", salt=b"")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        token = security.create_access_token(
+            user, datetime.now(timezone.utc) + timedelta(hours=1)
+        )
+    security.token_cache.invalidate()
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=token
+    )
+
+    statements, user, session = verify(engine, credentials)
+    assert statements > 0
+    assert user.username == "Anonym"
+    assert session is None
+
+    statements, cached, _ = verify(engine, credentials)
+    assert statements == 0
+    assert cached is user
+
+    touch("users")
+    statements, user, _ = verify(engine, credentials)
+    assert statements > 0
+    assert user is not cached
@@ -0,0 +1,65 @@
+"""
+Changes of request are committed together when endpoint returns,
+they are rolled back when endpoint raises or commit fails.
+"""
+
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from cardmaker import models, utils
+from cardmaker.database import UnitOfWork, search_index
+
+
+def saved_rows(engine) -> tuple:
+    """
+    Get number of committed cards and tags and revision counter of cards.
+    """
+    with Session(engine) as session:
+        cards = session.exec(select(models.Card)).all()
+        tags = session.exec(select(models.Tag)).all()
+        revision = session.exec(
+            select(models.RevisionCounter.value).where(
+                models.RevisionCounter.name == "cards"
+            )
+        ).first()
+        return len(cards), len(tags), revision
+
+
+def test_flushed_write_is_rolled_back(
+    engine, client, headers, new_cards, monkeypatch
+):
+    save_card_or_raise_500 = utils.save_card_or_raise_500
+    saved = []
+
+    async def save_and_raise(*args, **kwargs):
+        card = await save_card_or_raise_500(*args, **kwargs)
+        saved.append(card.id)
+        raise HTTPException(status_code=409, detail="Conflict")
+
+    before = saved_rows(engine)
+    monkeypatch.setattr(utils, "save_card_or_raise_500", save_and_raise)
+    response = client.post("/cards", json=new_cards(1)[0], headers=headers)
+    assert response.status_code == 409
+    # card was flushed with ID, but it is not committed
+    assert saved == [1]
+    assert saved_rows(engine) == before
+    assert search_index.stats()["cards"] == 0
+    assert client.get("/cards").json() == []
+
+
+def test_commit_error_is_reported(
+    engine, client, headers, new_cards, monkeypatch
+):
+    async def fail(self):
+        raise IOError("Database operation failed!")
+
+    before = saved_rows(engine)
+    monkeypatch.setattr(UnitOfWork, "commit", fail)
+    response = client.post("/cards", json=new_cards(1)[0], headers=headers)
+    assert response.status_code == 500
+    assert response.json() == {
+        "detail": "An exception occurred: Database operation failed!"
+    }
+    monkeypatch.undo()
+    assert saved_rows(engine) == before
+    assert client.get("/cards").json() == []